@@ -0,0 +1,87 @@
+import os
+
+import shared
+from cache import cache_path, file_digest, read_json, write_json
+from loader import DATA_PATH, load_dataset
+from segments import FILTERS, SegmentEngine
+from streaming import aggregate_file
+from tracing import span
+
+# Bump when the snapshot layout or the chart logic changes, so stale files on disk are ignored
+SNAPSHOT_FORMAT = 3
+
+# Retained customers scoring at or above this quantile count as at-risk
+RISK_QUANTILE = 0.93
+
+# Files at least this large are aggregated out-of-core in chunks instead of loaded whole
+STREAMING_MIN_BYTES = int(os.getenv('DASHBOARD_STREAMING_MIN_BYTES', 512 * 1024 * 1024))
+
+# In-memory snapshots, keyed by dataset version
+_snapshots = {}
+
+
+def compute_kpis(p1):
+    """KPI values for the churn scores `p1` of retained customers."""
+    total_retained = len(p1)
+    if not total_retained:
+        return dict(threshold=0.0, total_retained=0, total_at_risk=0, percent_at_risk=0, avg_score_retained=0.0)
+    threshold = p1.quantile(RISK_QUANTILE)
+    total_at_risk = int((p1 >= threshold).sum())
+    return dict(
+        threshold=float(threshold),
+        total_retained=total_retained,
+        total_at_risk=total_at_risk,
+        percent_at_risk=total_at_risk / total_retained,
+        avg_score_retained=float(p1.mean()),
+    )
+
+
+def filter_values(retained):
+    """Values offered by each filter dropdown."""
+    return {column: sorted(str(value) for value in retained[column].dropna().unique()) for column, _ in FILTERS}
+
+
+def compute_snapshot(df, version):
+    """KPI values, chart rows and filter values for one dataset version, as plain JSON-serializable data."""
+    retained = df[df['predict'] == 0]
+    return dict(
+        format=SNAPSHOT_FORMAT,
+        version=version,
+        kpis=compute_kpis(retained['p1']),
+        charts=SegmentEngine(retained).rows(),
+        filters=filter_values(retained),
+    )
+
+
+def get_snapshot(path=DATA_PATH):
+    """
+    Aggregates for the current contents of `path`.
+    Served from memory when possible, then from disk, and only recomputed when the file changes.
+    Workers attached to a published dataset (see shared.py) serve its current version instead.
+    """
+    if shared.SHARED_DIR:
+        return shared.snapshot()
+
+    version = file_digest(path)
+    snapshot = _snapshots.get(version)
+    if snapshot is not None:
+        return snapshot
+
+    snapshot_file = cache_path('aggregates', f'v{SNAPSHOT_FORMAT}-{version}.json')
+    snapshot = read_json(snapshot_file)
+    if snapshot is None or snapshot.get('format') != SNAPSHOT_FORMAT:
+        if os.path.getsize(path) >= STREAMING_MIN_BYTES:
+            with span('snapshot.stream'):
+                kpis, charts = aggregate_file(path, RISK_QUANTILE)
+            snapshot = dict(format=SNAPSHOT_FORMAT, version=version, kpis=kpis, charts=charts)
+        else:
+            with span('snapshot.load'):
+                df = load_dataset(path)
+            with span('snapshot.compute'):
+                snapshot = compute_snapshot(df, version)
+        write_json(snapshot_file, snapshot)
+
+    # Only the current version is worth keeping around
+    _snapshots.clear()
+    _snapshots[version] = snapshot
+    return snapshot
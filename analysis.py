@@ -0,0 +1,223 @@
+import json
+import os
+import subprocess
+
+from segments import FILTERS
+from tracing import span
+
+# 'screenshot' has the LLM read a capture of the rendered page;
+# 'structured' sends the already computed KPI values and segment series in the prompt instead
+ANALYSIS_MODE = os.getenv('ANALYSIS_MODE', 'screenshot')
+
+# Instructions sent to the LLM alongside the dashboard screenshot
+ANALYSIS_PROMPT = (
+    "You are an Executive Intelligence Agent specializing in customer churn analysis for Amex Credit Card Company.\n\n"
+    "You are given a screenshot of a bank's internal dashboard that includes churn metrics, customer behavior segments, KPIs, and risk indicators.\n\n"
+    "Your role is to:\n"
+    "1. Visually analyze the dashboard and extract meaningful patterns related to churn, customer behavior, or emerging risks.\n"
+    "2. Write a professional action plan as if you are the Head of Customer Strategy at a credit card company.\n"
+    "3. Avoid generic insights. Use industry terminology and recommend realistic, high-level decisions based on the dashboard.\n\n"
+    "4. Contextualize findings using relevant real-world events — reference financial news about the credit card industry or AMEX "
+    "(e.g., macroeconomic changes, regulatory shifts, competitive moves) that may help explain the trends.\n"
+    "5. Makesure to fetch the current news in the finance and market trends to provide best action plan t"
+    "6. Generate a strict JSON output with the following schema: don't add any inner json - ONLY Follow the following pattern\n\n"
+    "<insert JSON schema here exactly as you've shown>\n\n"
+    "**Dashboard context:**\n"
+    "- The dashboard tracks credit card churn using behavioral and demographic data.\n"
+    "- KPIs: Attrition Rate, Avg. Tenure, Avg. Credit Utilization.\n\n"
+    "Charts include:\n"
+    "- Education vs Attrition (stacked bar, 3-letter labels)\n"
+    "- Card Category vs Attrition (log-scaled bar)\n"
+    "- Age vs Attrition (histogram)\n"
+    "- Total Transaction Count (smoothed, log-scaled line chart)\n"
+    "- Utilization Ratio (log-scaled line)\n"
+    "- Spending Change Q4–Q1 (log-scaled line)\n\n"
+    "All line charts are binned and log-transformed.\n\n"
+    "Strict formatting rules:\n"
+    "- Do not exceed 12 words in executive_summary and key_observations.\n"
+    "- Base all insights on the dashboard — no invented data.\n"
+    "- Return valid JSON only. No comments, no markdown, no extra text.\n"
+)
+
+# Instructions for the structured mode; the dashboard data itself follows DATA_MARKER
+STRUCTURED_PROMPT = (
+    "You are an Executive Intelligence Agent specializing in customer churn analysis for Amex Credit Card Company.\n\n"
+    "You are given the data behind a bank's internal churn dashboard as compact JSON: KPIs for active (not churned) "
+    "customers and the average churn score (0-100) of active customers in each behavioral and demographic segment.\n"
+    "`population` says which active customers the numbers describe. When it names a filtered segment (for example one card "
+    "category), every observation and recommendation is about that segment only; do not present it as the whole portfolio.\n\n"
+    "Your role is to:\n"
+    "1. Analyze the data and extract meaningful patterns related to churn, customer behavior, or emerging risks.\n"
+    "2. Write a professional action plan as if you are the Head of Customer Strategy at a credit card company.\n"
+    "3. Avoid generic insights. Use industry terminology and recommend realistic, high-level decisions based on the data.\n"
+    "4. Contextualize findings using relevant real-world events — reference financial news about the credit card industry or AMEX "
+    "(e.g., macroeconomic changes, regulatory shifts, competitive moves) that may help explain the trends.\n"
+    "5. Generate a strict JSON output following the requested schema.\n\n"
+    "Strict formatting rules:\n"
+    "- Do not exceed 12 words in executive_summary and key_observations.\n"
+    "- Base all insights on the data — no invented numbers.\n"
+    "- Return valid JSON only. No comments, no markdown, no extra text.\n"
+)
+
+DATA_MARKER = '**Dashboard data:**'
+
+PROMPTS = {
+    'screenshot': ANALYSIS_PROMPT,
+    'structured': STRUCTURED_PROMPT,
+}
+
+# What each chart's rows hold, as the LLM sees it
+SEGMENT_DESCRIPTIONS = {
+    'revolving': 'revolving_balance_quartile',
+    'txn_band': 'transaction_band',
+    'util': 'utilization_ratio',
+    'transaction': 'transaction_count_decile_midpoint',
+    'contact': 'contact_level',
+    'age': 'age_group',
+}
+
+# Shape of the parsed insight, enforced on the LLM side through guided JSON
+INSIGHT_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {
+        "summary": {
+            "type": "object",
+            "properties": {
+                "executive_summary": {"type": "string"}
+            },
+            "required": ["executive_summary"]
+        },
+        "key_observations": {
+            "type": "array",
+            "items": {"type": "string"}
+        },
+        "executive_action_plan": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "department": {"type": "string"},
+                    "recommendation": {"type": "string"}
+                },
+                "required": ["department", "recommendation"]
+            }
+        },
+        "news_article_sources": {
+            "type": "array",
+            "items": {"type": "string"}
+        }
+    },
+    "required": ["summary", "key_observations", "executive_action_plan", "news_article_sources"]
+}
+
+
+def analyze_dashboard(client, report):
+    """
+    Screenshot the dashboard and have H2OGPTE turn it into an action plan.
+    Blocking: runs on a worker thread, calling `report(stage)` as it moves through the pipeline.
+    """
+    # Capture dashboard screenshot
+    report('Capturing dashboard')
+    with span('analysis.screenshot'):
+        subprocess.run(['python', 'screen_capture.py'], capture_output=True)
+
+    # Upload and analyze in a throwaway collection, removed again once the reply is in
+    report('Uploading screenshot')
+    with span('analysis.collection'):
+        collection_id = client.create_collection(
+            name='temp_analysis',
+            description='Dashboard analysis'
+        )
+    chat_session_id = None
+    try:
+        with span('analysis.upload'), open('screenshots/dashboard.png', 'rb') as f:
+            upload_id = client.upload('dashboard.png', f)
+
+        report('Ingesting screenshot')
+        with span('analysis.ingest'):
+            client.ingest_uploads(collection_id, [upload_id])
+
+        report('Generating insights')
+        with span('analysis.query'):
+            chat_session_id = client.create_chat_session(collection_id)
+            with client.connect(chat_session_id) as session:
+                reply = session.query(
+                    ANALYSIS_PROMPT,
+                    llm_args=dict(
+                        response_format='json_object',
+                        guided_json=INSIGHT_SCHEMA,
+                    ),
+                    timeout=90
+                )
+    finally:
+        with span('analysis.cleanup'):
+            cleanup(client, collection_id, chat_session_id)
+
+    return json.loads(reply.content)
+
+
+def run_analysis(client, snapshot, mode, report):
+    """Action plan for the dashboard in `snapshot`, using the selected analysis mode."""
+    if mode == 'structured':
+        return analyze_data(client, snapshot, report)
+    return analyze_dashboard(client, report)
+
+
+def structured_payload(snapshot):
+    """Compact JSON of the population, KPI values and per-segment [segment, avg churn score] series."""
+    kpis = snapshot['kpis']
+    # Filtered views carry their selection; the unfiltered snapshot covers every active customer
+    labels = dict(FILTERS)
+    selection = {labels.get(column, column): value for column, value in (snapshot.get('selection') or {}).items()}
+    payload = dict(
+        population=selection or 'all active customers',
+        kpis=dict(
+            active_customers=kpis['total_retained'],
+            at_risk_customers=kpis['total_at_risk'],
+            at_risk_share=round(kpis['percent_at_risk'], 4),
+            avg_churn_score=round(kpis['avg_score_retained'], 2),
+            at_risk_score_threshold=kpis['threshold'],
+        ),
+        avg_churn_score_by={
+            SEGMENT_DESCRIPTIONS.get(name, name): [[key, round(score, 2)] for key, score in rows]
+            for name, rows in snapshot['charts'].items()
+        },
+    )
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+
+
+def analyze_data(client, snapshot, report):
+    """
+    Have H2OGPTE build the action plan straight from the computed numbers.
+    No screenshot, upload or ingestion: the data travels in the prompt of a collection-less chat.
+    """
+    report('Generating insights')
+    chat_session_id = client.create_chat_session()
+    try:
+        with span('analysis.query'), client.connect(chat_session_id) as session:
+            reply = session.query(
+                f'{STRUCTURED_PROMPT}\n{DATA_MARKER}\n{structured_payload(snapshot)}\n',
+                llm_args=dict(
+                    response_format='json_object',
+                    guided_json=INSIGHT_SCHEMA,
+                ),
+                timeout=90
+            )
+    finally:
+        try:
+            client.delete_chat_sessions([chat_session_id])
+        except Exception as e:
+            print(f"Could not remove analysis chat session {chat_session_id}: {e}")
+
+    return json.loads(reply.content)
+
+
+def cleanup(client, collection_id, chat_session_id=None):
+    # Best effort: a failed cleanup must not hide the analysis result or the original error
+    try:
+        if chat_session_id:
+            client.delete_chat_sessions([chat_session_id])
+        client.delete_collections([collection_id])
+    except Exception as e:
+        print(f"Could not remove analysis collection {collection_id}: {e}")
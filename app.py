@@ -1,42 +1,72 @@
-import pandas as pd
-import numpy as np
-from collections import Counter
 from h2o_wave import main, app, Q, ui, data
-from h2ogpte import H2OGPTE
 from dotenv import load_dotenv
 import asyncio
-import json
+import weakref
+from types import SimpleNamespace
+
+import ingest
+import insights
+import jobs
+import render
+import report
+import tracing
+from aggregates import get_snapshot
+from analysis import ANALYSIS_MODE, PROMPTS, run_analysis
+from clients import client_pool
+from at_risk import COLUMNS as AT_RISK_COLUMNS, PAGE_SIZE as AT_RISK_PAGE_SIZE
+from filters import FilterIndex, filtered_view, get_index
+from segments import CUBE_LABELS, FILTERS
+from tracing import span
 
 # Load environment variables
 load_dotenv()
 
-# Load and prepare data
-df = pd.read_csv("data/dashboard.csv")
+# Dropdown value meaning no filter on that column
+ALL = '__all__'
 
-# Initialize H2OGPTE client
-def get_client():
-    return H2OGPTE(
-            address='https://h2ogpte.genai.h2o.ai',
-            api_key=api_key,
-            )
+# Heatmap axes shown until the user picks others
+HEATMAP_AXES = ('txn_band', 'contact')
+
+# Open dashboard pages that receive live updates while records are being ingested, by client
+live_pages = weakref.WeakKeyDictionary()
+
+
+async def startup():
+    source = ingest.configured_source()
+    if source is not None:
+        asyncio.ensure_future(ingest.run(source, push_live_update))
+    if tracing.TRACING and tracing.TRACING_EXPORT:
+        asyncio.ensure_future(tracing.export_periodically())
+
+
+async def push_live_update():
+    snapshot = ingest.current_snapshot(get_snapshot())
+    for client, page in list(live_pages.items()):
+        # Filtered views describe the scored file only, so they have nothing new to show
+        if any((client.filters or {}).values()):
+            continue
+        show_metrics(SimpleNamespace(client=client, page=page), snapshot['kpis'], snapshot['charts'])
+        try:
+            await page.save()
+        except Exception:
+            live_pages.pop(client, None)
 
-parsed = None
 
-@app('/')  # Keep this as default route
+@app('/', on_startup=startup)  # Keep this as default route
 @app('/report')  
 async def serve(q: Q):
-    client = get_client()
-    if q.args.report:
-        await show_report(q)
-    else:
-        await show_dashboard(q, client)
-    await q.page.save()
-
-async def show_dashboard(q: Q, client):
-    global parsed
+    with span('serve'):
+        if q.args.report:
+            await show_report(q)
+        else:
+            await show_dashboard(q)
+        with span('serve.save'):
+            await q.page.save()
 
+async def show_dashboard(q: Q):
+    # Only cards whose data changed since this client's last render are sent
     # Create dashboard layout
-    q.page['meta'] = ui.meta_card(
+    render.sync(q, 'meta', 'dashboard', ui.meta_card(
         box='',
         layouts=[
             ui.layout(
@@ -44,6 +74,7 @@ async def show_dashboard(q: Q, client):
                 width='100%',
                 zones=[
                     ui.zone('header',size= '100px'),
+                    ui.zone('filters', size='90px'),
                     ui.zone('kpis', direction=ui.ZoneDirection.ROW, size='125px'),
                     ui.zone('insight'),
                    ui.zone('chart_row1', direction=ui.ZoneDirection.ROW, size='200px', zones=[
@@ -56,39 +87,113 @@ async def show_dashboard(q: Q, client):
                     ui.zone('col5', size='33%'),
                     ui.zone('col6', size='33%'),
                 ]),
+                ui.zone('heatmap', direction=ui.ZoneDirection.ROW, size='320px', zones=[
+                    ui.zone('heatmap_axes', size='25%'),
+                    ui.zone('heatmap_plot', size='75%'),
+                ]),
+                ui.zone('drilldown'),
+                ui.zone('perf'),
                 ]
             )
         ]
-    )
+    ))
 
     # Header
-    q.page['header'] = ui.header_card(
+    render.sync(q, 'header', 'dashboard', ui.header_card(
         box='header',
         title='American Express | Executive Dashboard for Churn Intelligence',
         subtitle='Powered by H2O.ai',
-    )
+    ))
+
+    # KPI values and chart rows are precomputed once per dataset version,
+    # and per filter combination from the bitmap index
+    with span('dashboard.view'):
+        snapshot = ingest.current_snapshot(get_snapshot())
+        selection = selected_filters(q, snapshot)
+        view = filtered_view(snapshot, selection)
+    live_pages[q.client] = q.page
+
+    # Segment filters; not offered when the dataset is aggregated out-of-core
+    if snapshot.get('filters'):
+        render.sync(q, 'filters', snapshot['filters'], ui.form_card(
+            box='filters',
+            items=[ui.inline(items=[
+                ui.dropdown(
+                    name=f'filter_{column}',
+                    label=label,
+                    value=selection.get(column) or ALL,
+                    choices=[ui.choice(ALL, 'All')] + [ui.choice(value, value) for value in snapshot['filters'][column]],
+                    trigger=True,
+                    width='200px',
+                )
+                for column, label in FILTERS
+            ])]
+        ))
+
+    with span('dashboard.metrics'):
+        show_metrics(q, view['kpis'], view['charts'])
+
+    # Cross-segment heatmap and at-risk customers behind the KPIs; both need the in-memory index,
+    # so they are not offered out-of-core
+    if snapshot.get('filters'):
+        with span('dashboard.heatmap'):
+            show_heatmap(q, snapshot, selection)
+        with span('dashboard.at_risk'):
+            show_at_risk_table(q, snapshot, selection)
+
+    # Analysis Section, showing the last analysis of these exact numbers if there is one
+    with span('dashboard.insight'):
+        insight_key = insights.fingerprint(view, PROMPTS[ANALYSIS_MODE])
+        cached = insights.get(insight_key)
+        render.sync(q, 'gpt_insight', cached, insight_card(cached), 'items')
 
-    # Filter retained (non-churned) customers and high-risk among them
-    retained = df[df['predict'] == 0]
+    # Handle analysis request
+    if q.args.analyze:
+        try:
+            q.client.parsed = await capture_and_analyze(q, view, insight_key)
+            q.client.parsed_key = insight_key
+            render.sync(q, 'gpt_insight', q.client.parsed, insight_card(q.client.parsed), 'items')
 
-    # # Min-Max scale the p1 column
-    df['p1'] = (df['p1'] - df['p1'].min()) / (df['p1'].max() - df['p1'].min())*100
+        except Exception as e:
+            q.page['gpt_insight'].items = [
+                ui.text_l(content='**Analysis Failed**'),
+                ui.text(content=str(e)),
+                ui.button(name='analyze', label='Retry Analysis', primary=True)
+            ]
+            render.forget(q, 'gpt_insight')
+
+    # Stage timings, for admins only
+    if tracing.is_admin(getattr(q.auth, 'username', None)):
+        show_perf(q)
+
+async def capture_and_analyze(q: Q, snapshot, insight_key):
+    # Unchanged numbers and prompt: reuse the stored analysis
+    parsed = insights.get(insight_key)
+    if parsed is None:
+        # Runs on the worker pool; clicks on the same dashboard state attach to the job already running
+        job = jobs.submit(insight_key, analyze_with_pooled_client, snapshot, ANALYSIS_MODE, stage='Starting analysis')
+        with span('analysis.wait'):
+            async for stage in job.progress():
+                q.page['gpt_insight'].items = [
+                    ui.text_l(content='**AI Insight Summary**'),
+                    ui.text(content='Analyzing dashboard...'),
+                    ui.progress(label=stage, caption='This may take 20-30 seconds')
+                ]
+                await q.page.save()
+            render.forget(q, 'gpt_insight')
 
-    # # Optionally, round for clarity in display
+            parsed = await job.result()
+        insights.put(insight_key, parsed)
+    return parsed
 
-    df['p1'] = df['p1'].round(0)
-    df['risk_score'] = df['p1'] 
 
-    threshold = retained['p1'].quantile(0.93)
-    at_risk = retained[retained['p1'] >= threshold]
-    # KPI Metrics
-    total_retained = len(retained)
-    total_at_risk = len(at_risk)
-    avg_score_retained = retained['p1'].mean()
-    percent_at_risk = total_at_risk / total_retained if total_retained else 0
+def analyze_with_pooled_client(snapshot, mode, report):
+    # Runs on a worker thread, holding a pooled H2OGPTE client only for the analysis itself
+    with client_pool.acquire() as client:
+        return run_analysis(client, snapshot, mode, report)
 
-    
 
+def show_metrics(q: Q, kpis, charts):
     # KPI Cards
     kpi_items = [
         ui.large_stat_card(
@@ -96,7 +201,7 @@ async def show_dashboard(q: Q, client):
             title='Active Customers',
             value='={{intl retained style="decimal"}}',
             aux_value='',
-            data=dict(retained=total_retained),
+            data=dict(retained=kpis['total_retained']),
             caption='Customers currently active (not churned).'
         ),
         ui.large_stat_card(
@@ -104,7 +209,7 @@ async def show_dashboard(q: Q, client):
             title='At-Risk Customers',
             value='={{intl at_risk style="decimal"}}',
             aux_value='',
-            data=dict(at_risk=total_at_risk),
+            data=dict(at_risk=kpis['total_at_risk']),
             caption='High churn score but still retained.'
         ),
         ui.large_stat_card(
@@ -112,7 +217,7 @@ async def show_dashboard(q: Q, client):
             title='% At-Risk',
             value='={{intl ratio style="percent" minimum_fraction_digits=1 maximum_fraction_digits=1}}',
             aux_value='',
-            data=dict(ratio=percent_at_risk),
+            data=dict(ratio=kpis['percent_at_risk']),
             caption='Share of active customers at risk of churn.'
         ),
         ui.large_stat_card(
@@ -120,7 +225,7 @@ async def show_dashboard(q: Q, client):
             title='Avg. Churn Score',
             value='={{intl score minimum_fraction_digits=2 maximum_fraction_digits=2}}',
             aux_value='',
-            data=dict(score=avg_score_retained),
+            data=dict(score=kpis['avg_score_retained']),
             caption='Average risk score out of 100.'
         ),
         
@@ -128,300 +233,220 @@ async def show_dashboard(q: Q, client):
 
     # Render KPI cards on the page
     for i, kpi in enumerate(kpi_items, 1):
-        q.page[f'kpi{i}'] = kpi
-
-        
-    # Bin total revolving balance into quantiles (e.g., quartiles)
-    retained['revolving_bin'] = pd.qcut(retained['Total_Revolving_Bal'], q=4, duplicates='drop')
+        render.sync(q, f'kpi{i}', kpi.data, kpi, 'data')
 
-    # Compute average churn score per bin
-    revolving_scores = retained.groupby('revolving_bin')['p1'].mean()
-
-    # Format rows for plotting
-    revolving_rows = [[f'{interval.left:.0f}–{interval.right:.0f}', round(score, 3)] for interval, score in revolving_scores.items()]
-
-    # Plot the chart
-    q.page['chart_revolving'] = ui.plot_card(
+    revolving_rows = charts['revolving']
+    render.sync(q, 'chart_revolving', revolving_rows, ui.plot_card(
         box=ui.box('col1', height='180px'),
         title='Avg. Churn Score by Revolving Balance',
         data=data('revolving_range score', len(revolving_rows), rows=revolving_rows),
         plot=ui.plot([ui.mark(type='interval', x='=revolving_range', y='=score', color='#007bff')])
-    )
-
-
-    # Group by transaction band and calculate average churn score (numeric!)
-    txn_band_scores = retained.groupby('txn_band')['p1'].mean()
-
-    # Prepare rows: no formatting, just raw values
-    txn_band_rows = [[band, score] for band, score in txn_band_scores.items()]
+    ))
 
-    # Create chart
-    q.page['chart_txn_band'] = ui.plot_card(
+    txn_band_rows = charts['txn_band']
+    render.sync(q, 'chart_txn_band', txn_band_rows, ui.plot_card(
         box=ui.box('col2', height='180px'),
         title='Avg. Churn Score by Transaction Band',
         data=data('txn_band score', len(txn_band_rows), rows=txn_band_rows),
         plot=ui.plot([
             ui.mark(type='interval', x='=txn_band', y='=score', color='#007bff')
         ])
-    )
-
-    # Round to reduce noise
-    retained['util_rounded'] = retained['Avg_Utilization_Ratio'].round(2)
-
-    # Group by and keep the natural groupby order (usually sorted by index)
-    util_scores = retained.groupby('util_rounded')['p1'].mean()
+    ))
 
-    # Format rows without sorting
-    util_rows = [[util, round(score, 3)] for util, score in util_scores.items()]
-
-    # Plot line chart
-    q.page['chart_util_line'] = ui.plot_card(
+    render.sync(q, 'chart_util_line', charts['util'], ui.plot_card(
         box=ui.box('col3', height='180px'),
         title='Churn Score by Avg. Utilization Ratio',
-        data=data(fields='Util Score', rows=util_rows),
+        data=data(fields='Util Score', rows=charts['util']),
         plot=ui.plot([
             ui.mark(type='line', x='=Util', y='=Score', color='#007bff')
         ])
-    )
-
-    # Create quantile bins (10 bins = deciles)
-    retained['txn_qbin'] = pd.qcut(retained['Total_Trans_Ct'], q=10, duplicates='drop')
+    ))
 
-    # Compute average churn score and midpoint of each bin
-    txn_qscores = retained.groupby('txn_qbin')['p1'].mean()
-    bin_midpoints = [interval.mid for interval in txn_qscores.index]
-
-    # Create rows: numeric midpoint for x, churn score for y
-    txn_qrows = [[round(mid, 2), round(score, 3)] for mid, score in zip(bin_midpoints, txn_qscores)]
-
-    # Plot the line chart
-    q.page['chart_transaction'] = ui.plot_card(
+    render.sync(q, 'chart_transaction', charts['transaction'], ui.plot_card(
         box=ui.box('col4', height='180px'),
         title='Churn Score by Total Transaction Count',
-        data=data(fields='TxnMid Score', rows=txn_qrows),
+        data=data(fields='TxnMid Score', rows=charts['transaction']),
         plot=ui.plot([
             ui.mark(type='line', x='=TxnMid', y='=Score', color='#007bff')
         ])
-    )
-
-    # Mapping for contact level bins
-    contact_level_map = {
-        0: 'No contact',
-        1: '1 contact',
-        2: '2–3 contacts',
-        3: '4+ contacts'
-    }
-
-    # Group and calculate average churn score
-    contact_scores = retained.groupby('contact_level')['p1'].mean()
-
-    # Build rows with human-readable labels
-    contact_rows = [[contact_level_map.get(level, str(level)), score] for level, score in contact_scores.items()]
+    ))
 
-    # Optional: Sort for consistent display
-    ordered_labels = ['No contact', '1 contact', '2–3 contacts', '4+ contacts']
-    contact_rows.sort(key=lambda x: ordered_labels.index(x[0]))
-
-    # Plot bar chart
-    q.page['chart_contact'] = ui.plot_card(
+    contact_rows = charts['contact']
+    render.sync(q, 'chart_contact', contact_rows, ui.plot_card(
         box=ui.box('col5', height='180px'),
         title='Avg. Churn Score by Contact Level',
         data=data('contact_group score', len(contact_rows), rows=contact_rows),  # note: column renamed to match x-axis
         plot=ui.plot([
             ui.mark(type='interval', x='=contact_group', y='=score', color='#007bff')
         ])
-    )
-
-    # Define age bins and labels
-    retained['age_group'] = pd.cut(
-        retained['Customer_Age'],
-        bins=[18, 30, 40, 50, 60, 70, 100],
-        labels=['18–30', '31–40', '41–50', '51–60', '61–70', '70+']
-    )
-
-    # Group by age group and get average churn score
-    age_scores = retained.groupby('age_group')['p1'].mean()
+    ))
 
-    # Prepare rows as [label, float_score]
-    age_rows = [[str(group), score] for group, score in age_scores.items()]
-
-    # Plot card
-    q.page['chart_age'] = ui.plot_card(
+    age_rows = charts['age']
+    render.sync(q, 'chart_age', age_rows, ui.plot_card(
         box=ui.box('col6', height='180px'),
         title='Avg. Churn Score by Age Group',
         data=data('age_group score', len(age_rows), rows=age_rows),
         plot=ui.plot([ui.mark(type='interval', x='=age_group', y='=score', color='#007bff')])
+    ))
+
+
+def show_heatmap(q: Q, snapshot, selection):
+    # Every dimension pair is precomputed per filter selection, so changing axes only reads the cube
+    x, y = q.client.heatmap_axes or HEATMAP_AXES
+    x = q.args.heatmap_x if q.args.heatmap_x in CUBE_LABELS else x
+    y = q.args.heatmap_y if q.args.heatmap_y in CUBE_LABELS else y
+    if x == y:
+        y = next(name for name in CUBE_LABELS if name != x)
+    q.client.heatmap_axes = (x, y)
+
+    render.sync(q, 'heatmap_axes', (x, y), ui.form_card(
+        box='heatmap_axes',
+        items=[
+            ui.text_l(content='**Segment Heatmap**'),
+            ui.dropdown(name='heatmap_x', label='Rows', value=x, trigger=True,
+                        choices=[ui.choice(name, label) for name, label in CUBE_LABELS.items()]),
+            ui.dropdown(name='heatmap_y', label='Columns', value=y, trigger=True,
+                        choices=[ui.choice(name, label) for name, label in CUBE_LABELS.items() if name != x]),
+        ]
+    ), 'items')
+
+    rows = get_index(snapshot['version']).heatmap(selection, x, y)
+    state = (snapshot['version'], FilterIndex.key(selection), x, y)
+    render.sync(q, 'heatmap', state, ui.plot_card(
+        box='heatmap_plot',
+        title=f'Avg. Churn Score by {CUBE_LABELS[x]} and {CUBE_LABELS[y]}',
+        data=data('row column score customers', len(rows), rows=rows),
+        plot=ui.plot([ui.mark(type='polygon', x='=column', y='=row', color='=score',
+                              color_range='#fee8c8 #fdbb84 #e34a33', x_title=CUBE_LABELS[y], y_title=CUBE_LABELS[x])])
+    ))
+
+
+def show_perf(q: Q):
+    # Percentiles over each span's recent durations; the card is resent on every event while shown
+    stats = tracing.summary()
+    q.page['perf'] = ui.form_card(
+        box='perf',
+        items=[
+            ui.text_l(content='**Performance** (ms, recent requests)'),
+            ui.table(
+                name='perf_table',
+                columns=[ui.table_column(name=name, label=name.title()) for name in ('span', 'count', 'p50', 'p95', 'p99', 'max')],
+                rows=[
+                    ui.table_row(name=name, cells=[name, str(stat['count'])] + [
+                        f'{stat[key] * 1000:.1f}' for key in ('p50', 'p95', 'p99', 'max')
+                    ])
+                    for name, stat in stats.items()
+                ],
+                height='300px',
+            ),
+        ]
     )
 
-    # Analysis Section
-    q.page['gpt_insight'] = ui.form_card(
-        box='insight',
+
+def show_at_risk_table(q: Q, snapshot, selection):
+    # Sorting and paging happen here on the server; the browser only ever receives one page
+    sort, descending = q.client.at_risk_sort or ('p1', True)
+    offset = q.client.at_risk_offset or 0
+    if selection != q.client.at_risk_selection:
+        offset = 0
+    events = q.events.at_risk_table
+    if events and events.sort:
+        column, reverse = next(iter(events.sort.items()))
+        if column in dict(AT_RISK_COLUMNS):
+            sort, descending, offset = column, bool(reverse), 0
+    if events and events.page_change:
+        offset = events.page_change.get('offset', 0)
+
+    index = get_index(snapshot['version'])
+    listing = index.at_risk_listing(selection, sort, descending)
+    page = index.at_risk.page(listing, offset)
+    q.client.at_risk_sort = (sort, descending)
+    q.client.at_risk_offset = offset
+    q.client.at_risk_selection = dict(selection)
+
+    state = (snapshot['version'], FilterIndex.key(selection), sort, descending, offset)
+    render.sync(q, 'at_risk', state, ui.form_card(
+        box='drilldown',
         items=[
+            ui.text_l(content=f'**At-Risk Customers** ({len(listing):,})'),
+            ui.table(
+                name='at_risk_table',
+                columns=[ui.table_column(name=column, label=label, sortable=True) for column, label in AT_RISK_COLUMNS],
+                rows=[
+                    ui.table_row(name=str(position), cells=[
+                        f'{record.p1:.0f}',
+                        str(record.Customer_Age),
+                        str(record.Card_Category),
+                        str(record.Total_Trans_Ct),
+                        f'{record.Total_Revolving_Bal:,}',
+                    ])
+                    for position, record in page
+                ],
+                pagination=ui.table_pagination(total_rows=len(listing), rows_per_page=AT_RISK_PAGE_SIZE),
+                events=['sort', 'page_change'],
+            ),
+        ]
+    ), 'items')
+
+
+def selected_filters(q: Q, snapshot):
+    """This client's filter selection ({column: value or None}), updated from the filter dropdowns."""
+    offered = snapshot.get('filters') or {}
+    selection = {}
+    for column, _ in FILTERS:
+        value = q.args[f'filter_{column}']
+        if value is None:
+            value = (q.client.filters or {}).get(column)
+        selection[column] = value if value in offered.get(column, ()) else None
+    q.client.filters = selection
+    return selection
+
+
+def insight_card(parsed):
+    return ui.form_card(
+        box='insight',
+        items=insight_items(parsed) if parsed else [
             ui.text_l(content='**AI Insight Summary**'),
             ui.text(content='Click below to generate insights'),
             ui.button(name='analyze', label='Analyze Dashboard', primary=True)
         ]
     )
 
-    # Handle analysis request
-    if q.args.analyze:
-        try:
-            q.page['gpt_insight'].items = [
-                ui.text_l(content='**AI Insight Summary**'),
-                ui.text(content='Analyzing dashboard...'),
-                ui.progress(label='Generating insights', caption='This may take 20-30 seconds')
-            ]
-            await q.page.save()
-
-            await capture_and_analyze(q, client)
-            
-            q.page['gpt_insight'].items = [
-                ui.text_l(content='**AI Insight Summary**'),
-                ui.text(content=parsed['summary']['executive_summary']),
-                ui.buttons(items=[
-                    ui.button(name='analyze', label='Refresh Analysis', primary=True),
-                    ui.button(name='report', label='View Action Plan', primary=True)
-                ])
-            ]
 
-        except Exception as e:
-            q.page['gpt_insight'].items = [
-                ui.text_l(content='**Analysis Failed**'),
-                ui.text(content=str(e)),
-                ui.button(name='analyze', label='Retry Analysis', primary=True)
-            ]
+def insight_items(parsed):
+    return [
+        ui.text_l(content='**AI Insight Summary**'),
+        ui.text(content=parsed['summary']['executive_summary']),
+        ui.buttons(items=[
+            ui.button(name='analyze', label='Refresh Analysis', primary=True),
+            ui.button(name='report', label='View Action Plan', primary=True)
+        ])
+    ]
 
-async def capture_and_analyze(q: Q, client):
-    global parsed
-  
-        # # Capture dashboard screenshot
-    process = await asyncio.create_subprocess_exec(
-            'python', 'screen_capture.py',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-    await process.communicate()
-
-        # Upload and analyze
-    collection_id = client.create_collection(
-        name='temp_analysis',
-        description='Dashboard analysis'
-    )
-        
-    with open('screenshots/dashboard.png', 'rb') as f:
-        upload_id = client.upload('dashboard.png', f)
-    
-    client.ingest_uploads(collection_id, [upload_id])
-        
-    chat_session_id = client.create_chat_session(collection_id)
-    with client.connect(chat_session_id) as session:
-        reply = session.query(
-            "You are an Executive Intelligence Agent specializing in customer churn analysis for Amex Credit Card Company.\n\n"
-            "You are given a screenshot of a bank's internal dashboard that includes churn metrics, customer behavior segments, KPIs, and risk indicators.\n\n"
-            "Your role is to:\n"
-            "1. Visually analyze the dashboard and extract meaningful patterns related to churn, customer behavior, or emerging risks.\n"
-            "2. Write a professional action plan as if you are the Head of Customer Strategy at a credit card company.\n"
-            "3. Avoid generic insights. Use industry terminology and recommend realistic, high-level decisions based on the dashboard.\n\n"
-            "4. Contextualize findings using relevant real-world events — reference financial news about the credit card industry or AMEX "
-            "(e.g., macroeconomic changes, regulatory shifts, competitive moves) that may help explain the trends.\n"
-            "5. Makesure to fetch the current news in the finance and market trends to provide best action plan t"
-            "6. Generate a strict JSON output with the following schema: don't add any inner json - ONLY Follow the following pattern\n\n"
-            "<insert JSON schema here exactly as you've shown>\n\n"
-            "**Dashboard context:**\n"
-            "- The dashboard tracks credit card churn using behavioral and demographic data.\n"
-            "- KPIs: Attrition Rate, Avg. Tenure, Avg. Credit Utilization.\n\n"
-            "Charts include:\n"
-            "- Education vs Attrition (stacked bar, 3-letter labels)\n"
-            "- Card Category vs Attrition (log-scaled bar)\n"
-            "- Age vs Attrition (histogram)\n"
-            "- Total Transaction Count (smoothed, log-scaled line chart)\n"
-            "- Utilization Ratio (log-scaled line)\n"
-            "- Spending Change Q4–Q1 (log-scaled line)\n\n"
-            "All line charts are binned and log-transformed.\n\n"
-            "Strict formatting rules:\n"
-            "- Do not exceed 12 words in executive_summary and key_observations.\n"
-            "- Base all insights on the dashboard — no invented data.\n"
-            "- Return valid JSON only. No comments, no markdown, no extra text.\n",
-
-            llm_args=dict(
-                response_format='json_object',
-                guided_json={
-                    "$schema": "http://json-schema.org/draft-07/schema#",
-                    "type": "object",
-                    "properties": {
-                        "summary": {
-                            "type": "object",
-                            "properties": {
-                                "executive_summary": {"type": "string"}
-                            },
-                            "required": ["executive_summary"]
-                        },
-                        "key_observations": {
-                            "type": "array",
-                            "items": {"type": "string"}
-                        },
-                        "executive_action_plan": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "department": {"type": "string"},
-                                    "recommendation": {"type": "string"}
-                                },
-                                "required": ["department", "recommendation"]
-                            }
-                        },
-                        "news_article_sources": {
-                            "type": "array",
-                            "items": {"type": "string"}
-                        }
-                    },
-                    "required": ["summary", "key_observations", "executive_action_plan", "news_article_sources"]
-                }
-            ),
-            timeout=90
-        )
-            
-    # print(reply.content) 
-    parsed = json.loads(reply.content)
-    q.client.parsed = parsed
-    q.client.parsed = parsed
-    print(f"Stored parsed data: {parsed}") 
-   
 
 async def show_report(q: Q):
-    q.page.drop()
-    
-    # Create report layout
-    q.page['meta'] = ui.meta_card(
+    # The stored analysis of the numbers currently on the dashboard, else this session's own if it was of them
+    with span('report.view'):
+        snapshot = ingest.current_snapshot(get_snapshot())
+        view = filtered_view(snapshot, selected_filters(q, snapshot))
+        insight_key = insights.fingerprint(view, PROMPTS[ANALYSIS_MODE])
+        insight = insights.get(insight_key)
+        if insight is None and q.client.parsed_key == insight_key:
+            insight = q.client.parsed
+    if insight is None:
+        # Nothing to report on yet
+        await show_dashboard(q)
+        return
+
+    # Report layout; the dashboard cards stay on the page, out of sight, so going back resends nothing
+    render.sync(q, 'meta', 'report', ui.meta_card(
         box='',
         layouts=[ui.layout(breakpoint='xl', zones=[ui.zone('report')])]
-    )
-
-    
-    q.page['report'] = ui.form_card(
-    box='report',
-    items=[
-        ui.image(title='Amex Logo', path='data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAMwAAADACAMAAAB/Pny7AAAAhFBMVEUBb9D///8AbM8Aas8AX8y2y+zk6/gYdNHv8/tDedNaiNcAaM41ftT3+f0AcdHW4vQAY81ejtiau+dTitipw+kAWcrC0e5ul9t7ot/L1/AzdNE0etOet+UAU8oAXMuPs+WCquE7hddsnN2PrOJZk9pLgtXL3fIATslsktp5nd56l9sybtAxDyClAAAOjElEQVR4nO2b6XajuhJGQWLqyIAMGNvBBs8nuXn/97uqKgFisGN356zD6sX3I7ELSWhrKI22rL9Gjvtf5+AHNcNMVTPMVDXDTFUzzFQ1w0xVM8xUNcNMVTPMVDXDTFUzzFQ1w0xVM8xUNcNMVTPMVDXDTFUzzFQ1w0xVM8xUNcNMVTPMVDXDTFUzzFQ1w0xVM8xUNcNMVTPMVDXDTFUzzFQ1w0xVLQzraGi5Z/x94WujB0kO8zWe0QEMsxaGCq5es+jJZ/1gfyRIzhLlShb0SiW/8JWaHAn11+/EUZln3VSiEZiozANDXsHYomNRyiWLVn3jb8vbCMspL653P0giLXYKDUPoqrroRLilfAjDj55tKitZcbO78i6CWZ79Qwo2K1kFj8OsIr7pWtaCd+LEYzBO1o3kWWIAY2eOPHzz+ucVbD6/TesgWQ/G5uJbGLaIIX0t9THclQjTVqj6cvPLHJ6ZNjsYKhwxNwx1iEDXcdgLExqJhCusGdN02weN4Q6MrCCgLzhotYVQ1MyEMqHXWEBGPgtgPpScVKov3lrynsqqTUvLv2RxiCwnR33dN5Xu5YfUpzDygpaEYUx5grxenI1hSuD5SRXCbaFeKvxxGObnCE3eThyxFVjwRsa1C4QCsXdnyJGo3aJDMH2P6uyU/b1rEyXbBZgsBF/FGiVbrGSdHEeYMNXfBRbpimAoQAGmEGCuAr6OwwhsvrU92kMLcLFmGkcuobi3YLqtandIMMLqKpIE07Oy8hMal/JhVqRhYlWrrWslGFdHjBwouPD4CTCRTvgUGD2F3YGxoPt7sjbKE3zdbE0YjBpCxZya3L8CA96/wpppYLylGTVCmPCztrEIi/QDYJqMaTd1u96HEUuIdwIzZV5CprMOjCV0Ow/bHBgw0tD+XMMwMjgOxSkDEwYriQI5oDKFul9gPEwdS7gyYfi79y0Mg7cH8HpWFJAQtikvqGEwbX4imFw2zC0Md2/bVp6GYYtMmwFBtZzMhMkpEcFPOxJkvkLABZZrEVIPaWEi7SQewLAFFHqFFJsEUmO/am/DkBAnMgU12AtvmFsYMRhLAYanuqPbwQFoxMmAwU/QpL0g1Kpb3ld+hORxHLBNGMjvNzDUWN/gue/GVywV14RZnnyoHrRRBV6wTT4PY7sRfD8aMHGEc7NLJ5aL1bywEyfC/wMYJh/DsHcogQxKn78FNhYYX5owR/fK6naWYfNJ0Au8AsMo1RYmLyNwnJ1Iys9b2M1vauKkvWoNE9EEFOkfwFwhAuaJHcAlY5vKDZiFt1ZR+BXSTpVBrAmhhWGHqlUSNzD14Bhj81FdsYEJd9jwurOVXOjWS22wrjaEYZuK2mX+CEZAx0MvwmCADz+48RaCiV3w9JEagWNErYJLF8YSrTNzMEFyJxvC21gSElAMLQz0oqh0TZbwjBVzsLWbAffXwlQx+YVfwQOYL/DDZyxfcOrkCfg1NmFCYADABN1M7PVhDKmOZ9euuWaEL+iKGhhzwKkVo99ceU0mRWXAHOyMUxXZ8V2YTWNj2La8K+ZjZ8LYJ2g11xu2RpbaT8J0JH95j2HCBLqRbls7LN330IQJ1pjL9+19GCiIDHP0HoO8FN3Mh2fCbNEtZDF6gmQII8eamUko5QeNlN1mtjVgAhrjEsxFggtRlpkwdo4hxDq/O50xineZKi0LjEueuIaxoQXIzQEefQUDGLbLDNWDpkJwsIVZ0XGTYOG0MAn2j8rs/lAxqt5RR3RePA1NGPuMVRNdjuw+TK6Lkebi9EVuAhMGCpLGShiW+jBisM6iGcAuz76QaqO9bM81M9+IctTTGyMTNGy0MIGe7SD1OAyNzz0x/2bCePtIz2ukOwJzf5zZOZgptw9DgyatUaj7l8NMkFdtYeyb02ZwHCYmQ9QKM70LDRjbrzsBLsmeh7E3OJpb2x5M8IklyJuGhkn2M4Fe1YCxT7JeNIzDhFh4kbNvhCsWNVaaMDjDsHCCNYTheWwo6MDYBbyfs26fUaOzQ42qqPLbLbTDPWZ+1eYCs8l3XRi7ZA9hAqjwyEnaNXwMNDiitTD0Mp2RoTdzWv1z7sLYHF7IedCF0VUDXmKvJhcHmkbFzZ5AuETXpZYnHZjt/iGMixUhzT6MQXgaGDC6GTBmj8EYahdnNUyAk33hB93FmVr81rlQ3Rw/OzsjE+SWlKPvwKiG9ggGPEQkD6GZDs0CYxOGbE5CMN1Z82MYe8vxFccQVmRRM1bmV0H5vajSpyWMOe5gGpHchLhsbmAC3XtHYeJ/uBDCgWQCDwRtKlIm7lxwd0binowqX2UTONlQ6w6pIq0QxoHohngJzexLfZBqymDjllEGYfjqFASfKjjfa8j4s4AYsBpeqAS5A8NBiJmAdlJJFUmwbQKxccqGL3clveh9BGaXLpVwVDmoj+kFEkzewHi14e/yhO8OK7CdsAK9M0R6A0T81NEbDNtrTBTGE+wq9JI3N6zgw7WZxeTnz2WqgsUfGBUc+A1CpPDJo0zkLvxLoUkcsLMd0L5cj8B4TUl4DpY9jFNBDMaYSsmjFog2vVOHZtqWGAi9WROx+mwjqFoPKF2whE1SdZtA0xoK3lnjdFPnrcnhYdlkhJrQyAxAC71vJC5m7/ljJatk1B7sdqPv8fSsLh97WK1628j3YfRWjPNjm+OghHN3zK5cwXosw5WeTVVjqFVvq/k+TL27Jw/9NP5EGRueJ4DUtFkUb8mtl+dQ544VY0Va9TcNvB7Mr1rtrP3XD+odZmZjD2CuJ6zBozoPo5FgY2U8uIYZOVK7ezD3G7qb3p1XPczE0N6D+Xs0w0xVM8xU9TfBRC/APOWEnwr4b6l8Gibyv5MeBsS3Af8tiWdhZBUM58ddZbi9xLLvwv17Cp+FGZ/7dnRQ8yTxoxO7V/WDMHbK8dj9v9NLMOFQdnOGB8dqwjaC9YM37xykccf+4Nm49RWYjEc9sTS7gNHycTPPxcVnwvDR4SbNLT0/PcR6MeKbe33R4pTTdB92O3rSx8KBl5yOfmuWCV5piZPTwgj8tGsmmMFtDHGNtwXcqRDvzRLMxWsdcmlvy05YLlcXWvy/845drAoXM7cZpC9x0R2f9o4w4gjcYrldyo6Vi5eaWdbfVrL48YbHnKrnv9VbLrgdxtXiautEveACN8KH1zfovo0+gO5EAJg8kt2EcOd4K7tW2AX7I5iIwW6SPmykyyDBh8Rl11a9jna5ja1jS1zjERglWNwPYSKAiRfCTEc1YFi6eoI1VvwDd+Feh+HGVuwK0g0/sYwELtsP+BkvhhAMKykondRIuBJTH96QaKdUhhomMrd69x8qRTo1dcpa+02oT5RN6z/q9S/DsOU2b7XFbTEfH8DORYb5wVZDMGyRu6gdnmHgLieOrteEUnBxqzda5RpGZkbyeawvOrCL2xo9fR/BYifDGrzmmhFG9C/nQT/BOudfAX6IHLrkhzD8WHvRmBpRrvdul/WOhYeXf+Sh3oju7WTQQfiid5x1+7LwDL9rfR3mNITRR3gixdNtoXcsuzC2vYSHcFYFMMK48YCRLqMn0Pogk3c3ZZQVMiXOPeuP1Ixt7+hMh07p9H5YHwavMY3BYLLrOzWT0xWF3pYUwvCPP60ZnrrGYWyuXxJu6gM6Jupdxz4M3Y6qYdpmhp1COVbdZyrzsDeuj/X9hAwu3Y/08KxUXLvWl2E63my/rtuyl2q/zZu61zD18RF2dLxCRae3OtNnX0Z0UWbozUr1Wn2frnZ+5arE094rG7G+DmMoEu19Xrr3pqo+6MBYFi02opKO2OC4oeOa9fWNdGScUXOgTN+Iam2RJd+3cLBhda2OFf8cTECen53CHoyebdDn6LvrG10BjH0WvGNU5B6coPWtxWsTTV3hrVZNMwsP+hifNVveW6efCuf4sH99Q8g3vERNMMalIon9L9ylyqbPsjDfJZgP18aKWNHqtYkmtvrjzpBbO4Cs2XBtppwdGDXfYNLH+8Dt9Q16slhX7VG0Wt6Z6dOee5ycN6QL8eLU6dZYl/hyfnkZZtw15+94povFv7iZMKye+chjpY8stQNwz+zO9Y2hai/i4TUVpn+60FjxbicrfgbGK/DRkSZp2uvSdKbQ05l8G9ftr3bNeBsIJjzfw7RUGKV/4BEvhnPX34ZJ8RU8TnDsFJuwgTHGmUbNoBliq+FFbMI8PusKS2v4oxI7xiPo12uGnzr7NJhtPJuHuaK+zUMH7N/D1BceFkafKXMz/aA9D4Vv3u1IU6qgY83p4sLpZZj2fp/yJRL7RwalFZUwuw9opo9tZQwmDLow4R5H8kVot97MSN/5H56gt+9DxwXe7OAYucB5bvT0JuC9lSYszm54H0n3lJhc2D40YfTpdF4V77cuDF1mwgsP91aaFR9YF7G+zt3JC/+BZTOdDzNfu6qMbiv5Ni2bESb/ZwUqpUzjHowaynHVcLoP0+/beOQ7QORy+xpM/7cyTDWzMEUrq6eXKkvwVeVuu2IQAhpcva1DN1C+hLLXMGGFP9LZn8Ng47DeC+QartR3fosj2AIGskM3L8KC28uvwLjXt56u6zi5Kmt6xZ/W4HWM+ALB0mseFxAClj/bukoJ5k0FuH6qVrnFrnLA8L/ysBqmr2at2TVtDenbuqL9LMOavqU07r4CE8QDeYFxyczjuDnraVNI/4YwFFOBbHB5XSfRRDTTt3tWfbFj3PoKzDcKLtwZvcDQh2lUrcbD/6Z+cuP8zNUqc+wCw30YzrZj4X9LXrX9ORj6JUY69oPF2z0YRr8w+HMF+Tl9epxhRb9vDlTQ2m/QiaEfN+n4nccFjP7fJvyErteC8eePAftOcyh2PyC7kw57KuFnpObfr5xpTl8zzFQ1w0xVM8xUNcNMVTPMVDXDTFUzzFQ1w0xVM8xUNcNMVTPMVDXDTFUzzFQ1w0xVM8xUNcNMVTPMVDXDTFUzzFQ1w0xVM8xUNcNMVTPMVDXDTFUzzFQ1w0xVfxnM/wFAH1OiEqxuYAAAAABJRU5ErkJggg==', width='300px'),
+    ))
 
-        ui.text_xl(content='# Customer Churn Action Plan'),
+    with span('report.build'):
+        render.sync(q, 'report', report.key(insight), await report.card(q, insight))
 
-        ui.separator(name='my_separator', visible=True),
-        ui.text_xl(content='## Top churn risk patterns identified:'),
-        *[ui.text_l(content=f'   • {obs}') for obs in parsed['key_observations']],
-
-
-        ui.separator(name='my_separator', visible=True),
-        ui.text_xl(content='## Department-wise Action Plan:'),
-        *[ui.text_l(content=f'  **{item["department"]}**: {item["recommendation"]}') for item in parsed['executive_action_plan']],
-
-
-        ui.separator(name='my_separator', visible=True),
-        ui.text_xl(content='## Hot News - Market trends'),
-        *[ui.text_l(content=f'  • {src}') for src in parsed['news_article_sources']],
-   
-    ]
-)
 
 if __name__ == '__main__':
     main(app)
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+
+# Customers shown per table page
+PAGE_SIZE = int(os.getenv('AT_RISK_PAGE_SIZE', 20))
+
+# Columns of the drill-down table, with their labels
+COLUMNS = [
+    ('p1', 'Churn Score'),
+    ('Customer_Age', 'Age'),
+    ('Card_Category', 'Card Category'),
+    ('Total_Trans_Ct', 'Transactions'),
+    ('Total_Revolving_Bal', 'Revolving Balance'),
+]
+
+
+class AtRiskIndex:
+    """
+    Retained customers of one dataset version, presorted by churn score (highest first).
+    The at-risk customers of the whole population are a prefix of that order, so listing them is a slice;
+    orders for the other sortable columns are built on first use and kept for the version's lifetime.
+    """
+
+    def __init__(self, retained, presorted=None):
+        self.frame = retained[[column for column, _ in COLUMNS]].reset_index(drop=True)
+        self.p1 = self.frame['p1'].to_numpy()
+        # `presorted` is (by_score, sorted_scores) from an earlier index over the same rows
+        if presorted is None:
+            by_score = np.argsort(-self.p1, kind='stable')
+            presorted = by_score, self.p1[by_score]
+        self.by_score, self.sorted_scores = presorted
+        self._orders = {}
+
+    def order(self, column):
+        """All row positions in ascending order of `column`."""
+        order = self._orders.get(column)
+        if order is None:
+            values = self.frame[column]
+            if values.dtype.name == 'category':
+                values = values.astype(str)
+            order = self._orders[column] = np.argsort(values.to_numpy(), kind='stable')
+        return order
+
+    def top(self, n, rows):
+        """Positions of the `n` highest scores among `rows`, highest first, by partial selection."""
+        if n <= 0:
+            return np.empty(0, dtype=np.int64)
+        scores = self.p1[rows]
+        if n < len(rows):
+            best = np.argpartition(-scores, n - 1)[:n]
+        else:
+            best = np.arange(len(rows))
+        return rows[best[np.argsort(-scores[best], kind='stable')]]
+
+    def listing(self, threshold, rows=None, sort='p1', descending=True):
+        """Positions of the at-risk customers (score >= threshold) among `rows`, in display order."""
+        if rows is None:
+            at_risk = self.by_score[:np.searchsorted(-self.sorted_scores, -threshold, side='right')]
+        else:
+            at_risk = self.top(int((self.p1[rows] >= threshold).sum()), rows)
+
+        if sort == 'p1':
+            return at_risk if descending else at_risk[::-1]
+        member = np.zeros(len(self.p1), dtype=bool)
+        member[at_risk] = True
+        order = self.order(sort)
+        ordered = order[member[order]]
+        return ordered[::-1] if descending else ordered
+
+    def page(self, listing, offset):
+        """One page of table records, a constant-size slice of `listing`."""
+        positions = listing[offset:offset + PAGE_SIZE]
+        records = self.frame.iloc[positions]
+        return list(zip(positions.tolist(), records.itertuples(index=False)))
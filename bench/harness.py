@@ -0,0 +1,96 @@
+"""Headless stand-ins for Wave's Q and page, and timing and memory statistics for the benchmarks."""
+import os
+import resource
+import time
+
+import numpy as np
+from h2o_wave.core import Expando, PageBase
+
+
+class Page(PageBase):
+    """A page that diffs like a real Wave page, but counts the bytes it would send instead of sending them."""
+
+    def __init__(self, url='/'):
+        super().__init__(url)
+        self.saves = 0
+        self.bytes_sent = 0
+
+    async def save(self):
+        diff = self._diff()
+        if diff:
+            self.saves += 1
+            self.bytes_sent += len(diff)
+
+
+class Site:
+    """Accepts uploads without storing them."""
+
+    async def upload(self, files):
+        return [f'/_f/bench/{os.path.basename(path)}' for path in files]
+
+
+class Session:
+    """One browser tab: a client and its page, producing a Q per event."""
+
+    site = Site()
+
+    def __init__(self):
+        self.client = Expando()
+        self.page = Page()
+
+    def q(self, args=None, events=None):
+        q = Expando()
+        q.args = Expando(args or {})
+        q.events = Expando({source: Expando(event) for source, event in (events or {}).items()})
+        q.client = self.client
+        q.page = self.page
+        q.site = self.site
+        return q
+
+
+class Timer:
+    """Collects wall-clock durations, in milliseconds, per label."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, label, seconds):
+        self.samples.setdefault(label, []).append(seconds * 1000)
+
+    def time(self, label, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.add(label, time.perf_counter() - start)
+        return result
+
+    async def time_async(self, label, fn, *args):
+        start = time.perf_counter()
+        result = await fn(*args)
+        self.add(label, time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        return {label: percentiles(samples) for label, samples in self.samples.items()}
+
+
+def percentiles(samples):
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return dict(n=len(samples), p50=p50, p95=p95, p99=p99, max=max(samples))
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def print_table(rows, columns):
+    widths = [max(len(column), *(len(format_cell(row.get(column))) for row in rows)) for column in columns]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(format_cell(row.get(column)).ljust(width) for column, width in zip(columns, widths)))
+
+
+def format_cell(value):
+    if isinstance(value, float):
+        return f'{value:.3f}'
+    return '' if value is None else str(value)
@@ -0,0 +1,92 @@
+"""
+Headless load driver: N concurrent dashboard sessions against the offline LLM stand-in.
+
+    python -m bench.load --sessions 50 --iterations 5 --rows 100000 [--llm-latency 0.5]
+
+Each session repeatedly loads the dashboard with a random filter selection, asks for an analysis
+and opens the report, all through app.serve on one event loop as the Wave server would drive it.
+Distinct selections give distinct analyses, so the worker pool, job sharing and insight cache are
+exercised the way concurrent users exercise them. Caches are written to a scratch directory unless
+--keep-cache is given. Prints p50/p95/p99 latency per event in milliseconds, the bytes each event
+sent to the page and the process's peak RSS.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from bench import synthetic
+from bench.harness import Session, Timer, peak_rss_mb, print_table
+
+EVENTS = ['page-load', 'analyze', 'report']
+
+
+async def run_session(app, timer, sent, filters, iterations, think, seed):
+    rng = random.Random(seed)
+    session = Session()
+    for _ in range(iterations):
+        column = rng.choice(list(filters))
+        selection = {f'filter_{name}': '__all__' for name in filters}
+        selection[f'filter_{column}'] = rng.choice(filters[column])
+        for event, args in zip(EVENTS, [selection, {'analyze': True}, {'report': True}]):
+            before = session.page.bytes_sent
+            await timer.time_async(event, app.serve, session.q(args))
+            sent.setdefault(event, []).append(session.page.bytes_sent - before)
+            if think:
+                await asyncio.sleep(rng.uniform(0, think))
+
+
+async def run(sessions, iterations, think):
+    import app
+    from aggregates import get_snapshot
+    from filters import get_index
+
+    # Load the data before the clock starts, as the server does on its first request
+    snapshot = get_snapshot()
+    get_index(snapshot['version'])
+
+    timer, sent = Timer(), {}
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        run_session(app, timer, sent, snapshot['filters'], iterations, think, seed)
+        for seed in range(sessions)
+    ])
+    elapsed = time.perf_counter() - start
+    return timer, sent, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=100_000, help='0 uses the scored file as it is')
+    parser.add_argument('--think', type=float, default=0, help='max random pause between events, seconds')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='seconds per stub LLM query')
+    parser.add_argument('--keep-cache', action='store_true')
+    args = parser.parse_args()
+
+    # Settings are read at import time, so they are fixed before the app is imported
+    data = synthetic.default_path(args.rows) if args.rows else None
+    if data:
+        os.environ['DASHBOARD_DATA'] = data
+    if not args.keep_cache:
+        os.environ['DASHBOARD_CACHE_DIR'] = tempfile.mkdtemp(prefix='dashboard-bench-')
+    if data:
+        synthetic.ensure(args.rows, data)
+    os.environ['H2OGPTE_CLIENT'] = 'local'
+    os.environ['LOCAL_LLM_LATENCY'] = str(args.llm_latency)
+    os.environ.setdefault('ANALYSIS_MODE', 'structured')
+
+    timer, sent, elapsed = asyncio.run(run(args.sessions, args.iterations, args.think))
+    summary = timer.summary()
+    rows = [dict(event=event, **summary[event], kb_sent=sum(sent[event]) / len(sent[event]) / 1024) for event in EVENTS]
+    print_table(rows, ['event', 'n', 'p50', 'p95', 'p99', 'max', 'kb_sent'])
+    events = sum(row['n'] for row in rows)
+    print(f'{args.sessions} sessions, {events} events in {elapsed:.2f}s ({events / elapsed:.1f}/s), '
+          f'peak rss {peak_rss_mb():.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Micro-benchmarks for data loading, each chart aggregation and full page construction, per data size.
+
+    python -m bench.micro --rows 10000 100000 1000000 --repeat 5 [--memory]
+
+Each size runs in its own process on a synthetic file (see bench.synthetic), so import-time settings
+such as DASHBOARD_DATA apply and sizes don't share caches or memory. Times are in milliseconds;
+--memory adds the peak traced allocation of one extra run of each step, in megabytes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+from bench import synthetic
+from bench.harness import Session, Timer, peak_rss_mb, print_table
+
+
+def benchmarks(path):
+    """(label, fn) pairs, in run order; later steps reuse what earlier ones built."""
+    import numpy as np
+
+    import aggregates
+    import app
+    import loader
+    import streaming
+    from at_risk import AtRiskIndex
+    from filters import FilterIndex
+    from segments import SEGMENTS, SegmentCube, SegmentEngine
+
+    loader.load_dataset(path)  # Writes the columnar cache that the warm load reads
+    df = loader.load_dataset(path)
+    retained = df[df['predict'] == 0]
+    engine = SegmentEngine(retained)
+    cube = SegmentCube(retained)
+    index = FilterIndex(retained, 'bench')
+    column, value = 'Card_Category', str(retained['Card_Category'].mode()[0])
+    snapshot = aggregates.get_snapshot(path)
+
+    def segment(spec):
+        def run():
+            codes, keys = spec.encode(retained[spec.column])
+            valid = codes >= 0
+            p1 = engine.p1[valid]
+            return np.bincount(codes[valid], weights=p1, minlength=len(keys)) / np.bincount(codes[valid], minlength=len(keys))
+        return run
+
+    def filtered_view():
+        index._views.clear()
+        return index.view({column: value})
+
+    def page(args=None):
+        session = Session()
+        asyncio.run(app.serve(session.q()))
+        if args:
+            asyncio.run(app.serve(session.q(args)))
+        return session.page.bytes_sent
+
+    return [
+        ('load: parse csv', lambda: loader.read_csv(path)),
+        ('load: columnar cache', lambda: loader.load_dataset(path)),
+        ('aggregate: kpis', lambda: aggregates.compute_kpis(retained['p1'])),
+        *[(f'aggregate: chart {spec.name}', segment(spec)) for spec in SEGMENTS],
+        ('aggregate: all charts (engine)', lambda: SegmentEngine(retained).rows()),
+        ('aggregate: snapshot', lambda: aggregates.compute_snapshot(df, 'bench')),
+        ('aggregate: streaming file', lambda: streaming.aggregate_file(path, aggregates.RISK_QUANTILE)),
+        ('aggregate: heatmap cube', lambda: cube.aggregate_pairs()),
+        ('filter: index build', lambda: FilterIndex(retained, 'bench')),
+        ('filter: new view', filtered_view),
+        ('filter: at-risk index', lambda: AtRiskIndex(retained)),
+        ('page: dashboard, first load', lambda: page()),
+        ('page: dashboard, filter change', lambda: page({f'filter_{column}': value})),
+        ('page: report', lambda: page({'report': True})),
+        ('page: cached snapshot', lambda: aggregates.get_snapshot(path) is snapshot),
+    ]
+
+
+def run_size(rows, repeat, memory):
+    path = synthetic.default_path(rows)
+    os.environ['DASHBOARD_DATA'] = path
+    synthetic.ensure(rows, path)
+    os.environ.setdefault('H2OGPTE_CLIENT', 'local')
+    os.environ.setdefault('ANALYSIS_MODE', 'structured')
+
+    timer = Timer()
+    results = []
+    for label, fn in benchmarks(path):
+        for _ in range(repeat):
+            timer.time(label, fn)
+        result = dict(rows=rows, step=label, **timer.summary()[label])
+        if memory:
+            tracemalloc.start()
+            fn()
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        results.append(result)
+    results.append(dict(rows=rows, step='process peak rss (mb)', max=peak_rss_mb()))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--memory', action='store_true')
+    parser.add_argument('--json', action='store_true', help='print results as JSON lines')
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        for result in run_size(args.rows[0], args.repeat, args.memory):
+            print(json.dumps(result))
+        return
+
+    results = []
+    for rows in args.rows:
+        command = [sys.executable, '-m', 'bench.micro', '--single', '--rows', str(rows), '--repeat', str(args.repeat)]
+        if args.memory:
+            command.append('--memory')
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+        results += [json.loads(line) for line in output.splitlines() if line.startswith('{')]
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+    else:
+        print_table(results, ['rows', 'step', 'n', 'p50', 'p95', 'max', 'peak_mb'])
+
+
+if __name__ == '__main__':
+    main()
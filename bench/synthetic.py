@@ -0,0 +1,62 @@
+"""
+Synthetic scored files for benchmarking, at any size.
+
+Rows are drawn with replacement from data/dashboard.csv, so every column keeps its dtype, its
+distribution and its joint distribution with the others; only the index column is renumbered.
+The file is written in chunks, so memory stays flat from 10k to 10M+ rows.
+
+    python -m bench.synthetic --rows 1000000 --out .cache/bench/dashboard-1m.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+SOURCE = 'data/dashboard.csv'
+
+CHUNK_ROWS = 1_000_000
+
+
+def generate(rows, out, source=SOURCE, seed=0, schema_only=False):
+    """Write `rows` resampled rows of `source` to `out` and return `out`."""
+    # Imported here: loader reads its settings at import time, and the benchmarks set them after choosing a file
+    from loader import SCHEMA
+
+    sample = pd.read_csv(source, index_col=0)
+    if schema_only:
+        sample = sample[list(SCHEMA)]
+    rng = np.random.default_rng(seed)
+
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    tmp = f'{out}.tmp'
+    with open(tmp, 'w', newline='') as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            size = min(CHUNK_ROWS, rows - start)
+            chunk = sample.iloc[rng.integers(0, len(sample), size)]
+            chunk.index = pd.RangeIndex(start, start + size)
+            chunk.to_csv(f, header=start == 0)
+    os.replace(tmp, out)
+    return out
+
+
+def default_path(rows, schema_only=True):
+    directory = os.path.join(os.getenv('DASHBOARD_CACHE_DIR', '.cache'), 'bench')
+    return os.path.join(directory, f'dashboard-{rows}{"-schema" if schema_only else ""}.csv')
+
+
+def ensure(rows, out, schema_only=True):
+    """Generate `out` with `rows` rows unless it already exists, and return it."""
+    if not os.path.exists(out):
+        generate(rows, out, schema_only=schema_only)
+    return out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--schema-only', action='store_true', help='only the columns the dashboard reads')
+    args = parser.parse_args()
+    print(generate(args.rows, args.out, seed=args.seed, schema_only=args.schema_only))
@@ -0,0 +1,56 @@
+import hashlib
+import json
+import os
+import tempfile
+
+# Root directory for everything the dashboard precomputes and persists
+CACHE_DIR = os.getenv('DASHBOARD_CACHE_DIR', '.cache')
+
+# (path, mtime, size) -> content digest, so unchanged files are hashed only once
+_digests = {}
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Content hash of a file, recomputed only when its mtime or size changes."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                h.update(block)
+        digest = h.hexdigest()[:16]
+        _digests[key] = digest
+    return digest
+
+
+def cache_path(*parts):
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path, obj):
+    write_text(path, json.dumps(obj))
+
+
+def write_text(path, text):
+    # Write to a unique temp file in the same directory and rename, so readers never see a partial
+    # file and concurrent writers of the same path never touch each other's temp file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
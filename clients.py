@@ -0,0 +1,46 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from h2ogpte import H2OGPTE
+
+from jobs import ANALYSIS_WORKERS
+from local_llm import LocalLLMClient
+
+
+def create_client():
+    """H2OGPTE client, or the offline stand-in with H2OGPTE_CLIENT=local."""
+    if os.getenv('H2OGPTE_CLIENT') == 'local':
+        return LocalLLMClient()
+    return H2OGPTE(
+        address=os.getenv('H2OGPTE_ADDRESS', 'https://h2ogpte.genai.h2o.ai'),
+        api_key=os.getenv('H2OGPTE_API_KEY'),
+    )
+
+
+class ClientPool:
+    """
+    Clients are created on first use and handed back for reuse, at most `size` at a time,
+    so every concurrent analysis has a client of its own and none is built per event.
+    """
+
+    def __init__(self, factory, size):
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def acquire(self):
+        with self._slots:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                client = self._factory()
+            try:
+                yield client
+            finally:
+                self._idle.put(client)
+
+
+client_pool = ClientPool(create_client, size=ANALYSIS_WORKERS)
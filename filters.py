@@ -0,0 +1,138 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import shared
+from aggregates import compute_kpis
+from at_risk import AtRiskIndex
+from loader import DATA_PATH, load_dataset
+from segments import FILTERS, SegmentCube, SegmentEngine
+from tracing import span
+
+# Filtered views kept per dataset version, most recently used last
+FILTER_CACHE_SIZE = int(os.getenv('FILTER_CACHE_SIZE', 128))
+
+_index = None
+
+
+class FilterIndex:
+    """
+    Bitmap index over the retained customers of one dataset version.
+    Each filter value owns a packed bitmap of the rows holding it; a filter combination is the AND of
+    the selected bitmaps, and the segment codes are encoded once, so a view never re-slices the DataFrame.
+    """
+
+    def __init__(self, retained, version, arrays=None):
+        self.version = version
+        self.size = len(retained)
+        self.p1 = retained['p1'].reset_index(drop=True)
+        self.retained = retained
+        # Per-row arrays published by another process (see shared.py); built here when None
+        self.arrays = arrays or {}
+        self.engine = SegmentEngine(retained, encoded=self.arrays.get('segments'))
+        self._at_risk = None
+        self._cube = None
+        self.bitmaps = {}
+        for column, _ in FILTERS:
+            codes, values = pd.factorize(retained[column], sort=True)
+            self.bitmaps[column] = {str(value): np.packbits(codes == i) for i, value in enumerate(values)}
+        self._views = OrderedDict()
+        self._listings = OrderedDict()
+        self._cubes = OrderedDict()
+
+    def rows(self, selection):
+        """Positions of the retained rows matching every selected filter value, or None for all rows."""
+        bits = None
+        for column, value in selection:
+            bitmap = self.bitmaps[column].get(value)
+            if bitmap is None:
+                return np.empty(0, dtype=np.int64)
+            bits = bitmap if bits is None else bits & bitmap
+        if bits is None:
+            return None
+        return np.flatnonzero(np.unpackbits(bits, count=self.size))
+
+    @staticmethod
+    def key(selection):
+        return tuple(sorted((column, value) for column, value in selection.items() if value is not None))
+
+    @property
+    def at_risk(self):
+        if self._at_risk is None:
+            self._at_risk = AtRiskIndex(self.retained, self.arrays.get('at_risk'))
+        return self._at_risk
+
+    @property
+    def cube(self):
+        if self._cube is None:
+            self._cube = SegmentCube(self.retained, encoded=self.arrays.get('cube'))
+        return self._cube
+
+    def view(self, selection):
+        """KPI values and chart rows for the customers matching `selection` ({column: value or None}), with the selection."""
+        key = self.key(selection)
+        view = self._views.get(key)
+        if view is None:
+            index = self.rows(key)
+            p1 = self.p1 if index is None else self.p1.iloc[index]
+            view = dict(
+                version=self.version,
+                selection=dict(key),
+                kpis=compute_kpis(p1),
+                charts=self.engine.rows(index),
+            )
+            remember(self._views, key, view)
+        else:
+            self._views.move_to_end(key)
+        return view
+
+    def at_risk_listing(self, selection, sort='p1', descending=True):
+        """At-risk customers matching `selection` in display order; page turns then only slice it."""
+        key = (self.key(selection), sort, descending)
+        listing = self._listings.get(key)
+        if listing is None:
+            rows = self.rows(key[0])
+            threshold = self.view(selection)['kpis']['threshold']
+            listing = self.at_risk.listing(threshold, rows, sort, descending)
+            remember(self._listings, key, listing)
+        else:
+            self._listings.move_to_end(key)
+        return listing
+
+    def heatmap(self, selection, x, y):
+        """Heatmap rows of dimensions `x` by `y` for `selection`; the cube is built once per selection, so axes are a lookup."""
+        key = self.key(selection)
+        totals = self._cubes.get(key)
+        if totals is None:
+            totals = self.cube.aggregate_pairs(self.rows(key))
+            remember(self._cubes, key, totals)
+        else:
+            self._cubes.move_to_end(key)
+        return self.cube.heatmap(totals, x, y)
+
+
+def remember(cache, key, value):
+    cache[key] = value
+    while len(cache) > FILTER_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def get_index(version, path=DATA_PATH):
+    global _index
+    if _index is None or _index.version != version:
+        with span('filters.index'):
+            if shared.SHARED_DIR:
+                _index = FilterIndex(shared.retained(version), version, shared.arrays(version))
+            else:
+                df = load_dataset(path)
+                _index = FilterIndex(df[df['predict'] == 0], version)
+    return _index
+
+
+def filtered_view(snapshot, selection):
+    """The snapshot itself when nothing is selected, otherwise the matching filtered view."""
+    if not any(selection.values()):
+        return snapshot
+    return get_index(snapshot['version']).view(selection)
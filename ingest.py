@@ -0,0 +1,166 @@
+"""
+Live ingest of newly scored customers.
+
+New records arrive either appended to a CSV file (INGEST_FILE, same header as the scored file; only rows
+written after startup are read) or as CSV files dropped into a queue directory (INGEST_DIR; each file
+is renamed to *.done once folded in, or to *.failed if it can't be). They are polled every
+INGEST_INTERVAL seconds.
+
+Each batch is folded into the running PartialAggregates of the scored file, so an update costs work
+proportional to the batch, plus a constant for finalizing the histograms, never a rescan. New scores
+are scaled with the scored file's p1 bounds and clipped to 0-100, and the quantile-binned charts keep
+the scored file's column ranges, so values beyond them fall into the outermost histogram bins.
+Filters and the at-risk table keep describing the scored file itself. When the scored file is
+replaced, the running aggregates are rebuilt from the new file, which is expected to include the
+records ingested before it; until then pages show the new file's own aggregates.
+"""
+import asyncio
+import io
+import os
+
+from aggregates import RISK_QUANTILE
+from cache import file_digest
+from loader import DATA_PATH, read_csv, scale_scores
+from streaming import PartialAggregates, aggregate_partials
+
+INGEST_FILE = os.getenv('INGEST_FILE')
+INGEST_DIR = os.getenv('INGEST_DIR')
+INGEST_INTERVAL = float(os.getenv('INGEST_INTERVAL', 2))
+
+_live = None
+
+
+class AppendedFile:
+    """Complete lines appended to a CSV file since the source was created."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.header = f.readline()
+        self.offset = os.path.getsize(path)
+
+    def read(self):
+        if os.path.getsize(self.path) < self.offset:
+            # Truncated or replaced: start over after the header
+            self.offset = len(self.header)
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        end = chunk.rfind(b'\n') + 1
+        if not end:
+            return None
+        self.offset += end
+        return read_csv(io.BytesIO(self.header + chunk[:end]))
+
+    # Lines are consumed as they are read, so a batch that fails is skipped rather than retried
+    def done(self):
+        pass
+
+    def failed(self):
+        pass
+
+
+class QueueDirectory:
+    """Whole CSV files dropped into a directory, one per read, oldest first."""
+
+    def __init__(self, path):
+        self.path = path
+        self.current = None
+
+    def read(self):
+        """Records of the oldest queued file; it stays queued until `done` or `failed` is called."""
+        names = sorted(name for name in os.listdir(self.path) if name.endswith('.csv'))
+        if not names:
+            return None
+        self.current = os.path.join(self.path, names[0])
+        return read_csv(self.current)
+
+    def done(self):
+        self._set_aside('.done')
+
+    def failed(self):
+        # Moved out of the way, so the files queued after it are still ingested
+        self._set_aside('.failed')
+
+    def _set_aside(self, suffix):
+        if self.current is not None:
+            os.replace(self.current, self.current + suffix)
+            self.current = None
+
+
+class LiveAggregates:
+    """Running aggregates of one version of the scored file plus every record ingested since."""
+
+    def __init__(self, path=DATA_PATH):
+        self.path = path
+        # Taken first: if the file is replaced while it is read, the next poll sees a new version and rebuilds
+        self.version = file_digest(path)
+        self.p1_min, self.p1_max, self.ranges, self.totals = aggregate_partials(path)
+        self.ingested = 0
+        self._snapshot = None
+
+    def partial(self, batch):
+        """Aggregates of one batch alone; the O(batch) part, safe to run off the event loop."""
+        scale_scores(batch, self.p1_min, self.p1_max)
+        batch['p1'] = batch['p1'].clip(0, 100)
+        partial = PartialAggregates(self.ranges)
+        partial.add(batch[batch['predict'] == 0])
+        return partial, len(batch)
+
+    def merge(self, partial, records):
+        self.totals.merge(partial)
+        self.ingested += records
+        self._snapshot = None
+
+    def snapshot(self, base):
+        """`base` with its KPI values and chart rows replaced by the live ones."""
+        if self._snapshot is None or self._snapshot['version'] != base['version']:
+            self._snapshot = dict(base, kpis=self.totals.kpis(RISK_QUANTILE), charts=self.totals.charts(),
+                                  ingested=self.ingested)
+        return self._snapshot
+
+
+def current_snapshot(base):
+    """The live snapshot once records have been ingested into `base`'s version, otherwise `base`."""
+    if _live is None or not _live.ingested or _live.version != base['version']:
+        return base
+    return _live.snapshot(base)
+
+
+def configured_source():
+    if INGEST_FILE:
+        return AppendedFile(INGEST_FILE)
+    if INGEST_DIR:
+        return QueueDirectory(INGEST_DIR)
+    return None
+
+
+async def run(source, on_update):
+    """Poll `source` forever, folding each batch in and awaiting `on_update()` afterwards."""
+    global _live
+    loop = asyncio.get_running_loop()
+    _live = await loop.run_in_executor(None, LiveAggregates)
+    while True:
+        updated = False
+        try:
+            if await loop.run_in_executor(None, file_digest, _live.path) != _live.version:
+                _live = await loop.run_in_executor(None, LiveAggregates, _live.path)
+                updated = True
+            # A source is drained one batch at a time, each acknowledged only once it has been merged
+            while True:
+                batch = await loop.run_in_executor(None, source.read)
+                if batch is None:
+                    break
+                if len(batch):
+                    _live.merge(*await loop.run_in_executor(None, _live.partial, batch))
+                    updated = True
+                source.done()
+        except Exception as e:
+            print(f"Ingest failed: {e}")
+            try:
+                source.failed()
+            except OSError as e:
+                print(f"Could not set the failed batch aside: {e}")
+        if updated:
+            await on_update()
+        await asyncio.sleep(INGEST_INTERVAL)
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+from cache import cache_path, read_json, write_json
+
+# How long an analysis stays valid, and how many are kept on disk and in memory
+INSIGHT_TTL = float(os.getenv('INSIGHT_CACHE_TTL', 24 * 3600))
+INSIGHT_MAX_ENTRIES = int(os.getenv('INSIGHT_CACHE_MAX_ENTRIES', 256))
+
+# key -> (created, insight), most recently used last
+_recent = OrderedDict()
+
+
+def fingerprint(snapshot, prompt):
+    """Key for an analysis: the numbers the dashboard renders plus the prompt that reads them."""
+    payload = json.dumps(dict(kpis=snapshot['kpis'], charts=snapshot['charts'], prompt=prompt), sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _entry_path(key):
+    return cache_path('insights', f'{key}.json')
+
+
+def get(key):
+    """Parsed insight for `key`, or None when missing or older than INSIGHT_TTL."""
+    entry = _recent.get(key)
+    if entry is None:
+        stored = read_json(_entry_path(key))
+        if stored is None:
+            return None
+        entry = (stored['created'], stored['insight'])
+
+    created, insight = entry
+    if time.time() - created > INSIGHT_TTL:
+        _recent.pop(key, None)
+        _remove(_entry_path(key))
+        return None
+
+    _remember(key, entry)
+    return insight
+
+
+def put(key, insight):
+    created = time.time()
+    write_json(_entry_path(key), dict(created=created, insight=insight))
+    _remember(key, (created, insight))
+    _evict()
+
+
+def _remember(key, entry):
+    _recent[key] = entry
+    _recent.move_to_end(key)
+    while len(_recent) > INSIGHT_MAX_ENTRIES:
+        _recent.popitem(last=False)
+
+
+def _evict():
+    # Drop expired entries, then the oldest ones beyond INSIGHT_MAX_ENTRIES
+    directory = os.path.dirname(_entry_path('_'))
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            path = os.path.join(directory, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+    entries.sort()
+    now = time.time()
+    for i, (modified, path) in enumerate(entries):
+        if now - modified > INSIGHT_TTL or i < len(entries) - INSIGHT_MAX_ENTRIES:
+            _remove(path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
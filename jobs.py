@@ -0,0 +1,77 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 4))
+
+# Blocking LLM pipelines run here, off the Wave event loop
+_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='analysis')
+
+# Jobs still in flight, keyed by what they analyze
+_jobs = {}
+
+
+class Job:
+    """
+    A blocking function running on the worker pool.
+    Any number of sessions can follow its progress and await the same result.
+    """
+
+    def __init__(self, key, stage):
+        self.key = key
+        self.stage = stage
+        self.future = None
+        self._listeners = []
+
+    def done(self):
+        return self.future.done()
+
+    def set_stage(self, stage):
+        self.stage = stage
+        for listener in self._listeners:
+            listener.put_nowait(stage)
+
+    async def progress(self):
+        """Yield the current stage, then every later stage until the job finishes."""
+        listener = asyncio.Queue()
+        self._listeners.append(listener)
+        try:
+            yield self.stage
+            while not self.future.done():
+                update = asyncio.ensure_future(listener.get())
+                await asyncio.wait({update, self.future}, return_when=asyncio.FIRST_COMPLETED)
+                if update.done():
+                    yield update.result()
+                else:
+                    update.cancel()
+        finally:
+            self._listeners.remove(listener)
+
+    async def result(self):
+        # Shield so a session going away doesn't cancel the job for everyone else attached to it
+        return await asyncio.shield(self.future)
+
+
+def submit(key, fn, *args, stage='Queued'):
+    """
+    Run `fn(*args, report)` on the worker pool, where `report(stage)` publishes progress.
+    If a job for `key` is already running, return that one instead of starting another.
+    """
+    job = _jobs.get(key)
+    if job is not None and not job.done():
+        return job
+
+    loop = asyncio.get_running_loop()
+    job = Job(key, stage)
+
+    def report(stage):
+        loop.call_soon_threadsafe(job.set_stage, stage)
+
+    def forget(_):
+        if _jobs.get(key) is job:
+            del _jobs[key]
+
+    job.future = loop.run_in_executor(_executor, fn, *args, report)
+    job.future.add_done_callback(forget)
+    _jobs[key] = job
+    return job
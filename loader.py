@@ -0,0 +1,100 @@
+import os
+import tempfile
+
+import pandas as pd
+
+from cache import cache_path, file_digest
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # Fall back to parsing the CSV on every startup
+    pa = None
+
+DATA_PATH = os.getenv('DASHBOARD_DATA', 'data/dashboard.csv')
+
+# Columns the dashboard reads, with the most compact dtype that holds them losslessly.
+# Scores and ratios stay float64 so rounding and binning match the raw file exactly.
+SCHEMA = {
+    'predict': 'int8',
+    'p1': 'float64',
+    'Customer_Age': 'int16',
+    'Total_Revolving_Bal': 'int32',
+    'Total_Trans_Ct': 'int32',
+    'contact_level': 'int8',
+    'txn_band': 'category',
+    'Avg_Utilization_Ratio': 'float64',
+    'Card_Category': 'category',
+    'Income_Category': 'category',
+    'Gender': 'category',
+    'Education_Level': 'category',
+    'Marital_Status': 'category',
+}
+
+# Bump when SCHEMA or the preparation steps change, so stale columnar caches are ignored
+SCHEMA_VERSION = 2
+
+
+def scale_scores(df, p1_min=None, p1_max=None):
+    """
+    Min-Max scale p1 to a 0-100 risk score, rounded for clarity in display.
+    Chunked readers pass the bounds of the whole file so every chunk is scaled the same way.
+    """
+    lo = df['p1'].min() if p1_min is None else p1_min
+    hi = df['p1'].max() if p1_max is None else p1_max
+    df['p1'] = ((df['p1'] - lo) / (hi - lo) * 100).round(0)
+    return df
+
+
+def read_csv(path=DATA_PATH, **kwargs):
+    return pd.read_csv(path, usecols=list(SCHEMA), dtype=SCHEMA, **kwargs)
+
+
+def load_dataset(path=DATA_PATH):
+    """
+    Prepared dashboard data for `path`.
+    The first load parses the CSV and writes an uncompressed Feather file next to the other caches;
+    later loads memory-map that file instead.
+    """
+    if pa is None:
+        return scale_scores(read_csv(path))
+
+    columnar_file = cache_path('dataset', f'v{SCHEMA_VERSION}-{file_digest(path)}.feather')
+    if not os.path.exists(columnar_file):
+        df = scale_scores(read_csv(path))
+        write_columnar(df, columnar_file)
+        prune_columnar(columnar_file)
+        return df
+    return read_columnar(columnar_file)
+
+
+def prune_columnar(keep):
+    """
+    Remove every other dataset cache, from this schema version or an older one: each is a full copy of
+    a scored file. Processes still mapping a removed file keep reading it until they let go.
+    """
+    directory = os.path.dirname(keep)
+    for entry in os.scandir(directory):
+        if entry.name.startswith('v') and entry.name.endswith('.feather') and entry.path != keep:
+            try:
+                os.unlink(entry.path)
+            except OSError as e:
+                print(f'Could not remove stale dataset cache {entry.path}: {e}')
+
+
+def write_columnar(df, path):
+    """Write `df` as uncompressed Feather, atomically, so it can be memory-mapped."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        feather.write_feather(df, tmp, compression='uncompressed')
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def read_columnar(path):
+    """Memory-map a file from write_columnar; numeric columns stay views onto the mapped pages."""
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
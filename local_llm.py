@@ -0,0 +1,100 @@
+"""
+Offline stand-in for the subset of the H2OGPTE client the dashboard uses.
+
+Select it with H2OGPTE_CLIENT=local. Replies follow INSIGHT_SCHEMA and are derived from the
+structured payload when there is one, so both latency and output shape can be checked without
+network access. LOCAL_LLM_LATENCY adds a fixed delay (seconds) to every query.
+"""
+import itertools
+import json
+import os
+import time
+
+from analysis import DATA_MARKER
+
+LATENCY = float(os.getenv('LOCAL_LLM_LATENCY', 0))
+
+
+class Reply:
+    def __init__(self, content):
+        self.content = content
+
+
+class LocalSession:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def query(self, message, llm_args=None, timeout=None, **kwargs):
+        if LATENCY:
+            time.sleep(LATENCY)
+        data = None
+        if DATA_MARKER in message:
+            data = json.loads(message.split(DATA_MARKER, 1)[1])
+        return Reply(json.dumps(local_insight(data)))
+
+
+class LocalLLMClient:
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def _id(self, kind):
+        return f'local-{kind}-{next(self._ids)}'
+
+    def create_collection(self, name, description, **kwargs):
+        return self._id('collection')
+
+    def upload(self, file_name, file, **kwargs):
+        file.read()
+        return self._id('upload')
+
+    def ingest_uploads(self, collection_id, upload_ids, **kwargs):
+        return None
+
+    def create_chat_session(self, collection_id=None, **kwargs):
+        return self._id('chat')
+
+    def connect(self, chat_session_id, **kwargs):
+        return LocalSession()
+
+    def delete_collections(self, collection_ids, **kwargs):
+        return None
+
+    def delete_chat_sessions(self, chat_session_ids, **kwargs):
+        return None
+
+
+def local_insight(data):
+    """A deterministic insight in the INSIGHT_SCHEMA shape; points at the riskiest segments when data is given."""
+    if data is None:
+        return dict(
+            summary=dict(executive_summary='Local analysis: no dashboard data was provided.'),
+            key_observations=['Screenshot analysis is not available offline.'],
+            executive_action_plan=[dict(department='Analytics', recommendation='Use the structured analysis mode.')],
+            news_article_sources=[],
+        )
+
+    kpis = data['kpis']
+    population = data.get('population')
+    if isinstance(population, dict):
+        selection = ', '.join(f'{label} {value}' for label, value in population.items())
+        customers = f'active customers ({selection})'
+    else:
+        customers = 'active customers'
+    observations = []
+    for segment, rows in data['avg_churn_score_by'].items():
+        if rows:
+            label, score = max(rows, key=lambda row: row[1])
+            observations.append(f'Highest {segment.replace("_", " ")} risk: {label} ({score}).')
+    return dict(
+        summary=dict(executive_summary=f'{kpis["at_risk_share"]:.1%} of {kpis["active_customers"]:,} {customers} at risk.'),
+        key_observations=observations,
+        executive_action_plan=[
+            dict(department='Customer Retention',
+                 recommendation=f'Contact the {kpis["at_risk_customers"]:,} customers scoring {kpis["at_risk_score_threshold"]:g}+.'),
+            dict(department='Marketing', recommendation='Target engagement offers at the highest-risk segments above.'),
+        ],
+        news_article_sources=[],
+    )
@@ -0,0 +1,107 @@
+"""
+Loader process for multi-worker deployments: prepares each version of the scored file once for all workers.
+
+    DASHBOARD_SHARED_DIR=/dev/shm/dashboard python -m publisher [--watch]
+
+Run it before the workers and give them the same DASHBOARD_SHARED_DIR; /dev/shm keeps the files in
+shared memory, any local directory works through the page cache. With --watch the scored file is
+checked every PUBLISH_INTERVAL seconds and each new version is published and swapped in. The
+previous version is kept until the next swap, so requests still working on it can finish.
+"""
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import shared
+from aggregates import compute_snapshot
+from at_risk import AtRiskIndex
+from cache import file_digest, write_json
+from loader import DATA_PATH, read_csv, scale_scores, write_columnar
+from segments import SegmentCube, SegmentEngine
+
+PUBLISH_INTERVAL = float(os.getenv('PUBLISH_INTERVAL', 10))
+
+
+def publish(path=DATA_PATH, shared_dir=shared.SHARED_DIR):
+    """Publish the current contents of `path` unless already published, make it current and return its version."""
+    version = file_digest(path)
+    target = shared.version_dir(version, shared_dir)
+    if not os.path.isdir(target):
+        os.makedirs(shared_dir, exist_ok=True)
+        # Built under a temporary name, so workers only ever see complete versions
+        tmp = tempfile.mkdtemp(dir=shared_dir, prefix=f'.{version}-')
+        try:
+            write_version(path, version, tmp)
+            # mkdtemp and mkstemp create owner-only files; workers may run as other users
+            os.chmod(tmp, 0o755)
+            for name in os.listdir(tmp):
+                os.chmod(os.path.join(tmp, name), 0o644)
+            os.rename(tmp, target)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+    shared.point_to(version, shared_dir)
+    prune(shared_dir, keep={version, *previous(shared_dir, version)})
+    return version
+
+
+def write_version(path, version, directory):
+    df = scale_scores(read_csv(path))
+    write_json(os.path.join(directory, 'snapshot.json'), compute_snapshot(df, version))
+
+    retained = df[df['predict'] == 0].reset_index(drop=True)
+    write_columnar(retained, os.path.join(directory, 'retained.feather'))
+
+    engine = SegmentEngine(retained)
+    cube = SegmentCube(retained)
+    at_risk = AtRiskIndex(retained)
+    for name, array in [
+        ('segments', engine.codes),
+        ('cube', cube.codes),
+        ('by_score', at_risk.by_score),
+        ('sorted_scores', at_risk.sorted_scores),
+    ]:
+        np.save(os.path.join(directory, f'{name}.npy'), array)
+    with open(os.path.join(directory, 'keys.pkl'), 'wb') as f:
+        pickle.dump(dict(segments=engine.keys, cube=cube.keys), f)
+
+
+def previous(shared_dir, current):
+    """The most recently published version other than `current`, as a list of zero or one."""
+    versions = [
+        entry for entry in os.scandir(shared_dir)
+        if entry.is_dir() and not entry.name.startswith('.') and entry.name != current
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime_ns)
+    return [versions[-1].name] if versions else []
+
+
+def prune(shared_dir, keep):
+    # Workers that still map a removed version keep their mappings; the space is freed when they let go
+    for entry in os.scandir(shared_dir):
+        if entry.is_dir() and entry.name not in keep:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--watch', action='store_true')
+    args = parser.parse_args()
+    if not shared.SHARED_DIR:
+        parser.error('set DASHBOARD_SHARED_DIR')
+
+    published = None
+    while True:
+        # The digest is only recomputed when the file's mtime or size changes
+        if file_digest(args.data) != published:
+            published = publish(args.data)
+            print(f'Published {args.data} as version {published}')
+        if not args.watch:
+            break
+        time.sleep(PUBLISH_INTERVAL)
@@ -0,0 +1,40 @@
+from h2o_wave import Data
+
+
+def sync(q, name, state, card, *fields):
+    """
+    Keep card `name` on this client's page in step with `state` while sending as little as possible.
+
+    The first time, `card` is put on the page. Afterwards nothing is sent while `state` is unchanged;
+    when it changes, only the named `fields` are copied from `card` onto the existing card (or the
+    whole card is replaced if no fields are named). `state` should be plain data that compares by value.
+    Wave can't assign a data buffer into an existing card, so a card whose named fields hold one is
+    replaced whole as well. What was sent is recorded per client and page url, so cards must only
+    change through sync; call `forget` after changing one directly.
+    """
+    rendered = _rendered(q)
+    if name not in rendered:
+        q.page[name] = card
+    elif rendered[name] != state:
+        values = [getattr(card, field) for field in fields]
+        if values and not any(isinstance(value, Data) for value in values):
+            existing = q.page[name]
+            for field, value in zip(fields, values):
+                setattr(existing, field, value)
+        else:
+            q.page[name] = card
+    rendered[name] = state
+
+
+def forget(q, name):
+    """Record that card `name` was changed outside sync, so the next sync replaces it whole."""
+    # Dropped rather than set to a placeholder: any value, None included, can be a real state
+    _rendered(q).pop(name, None)
+
+
+def _rendered(q):
+    # {card name: state} per page, since one client can have several routes open
+    pages = q.client.rendered
+    if pages is None:
+        pages = q.client.rendered = {}
+    return pages.setdefault(q.page.url, {})
@@ -0,0 +1,141 @@
+"""
+The action-plan report, built once per analysis result.
+
+The logo is a static file. Set STATIC_URL to where the Wave server serves ./static
+(e.g. H2O_WAVE_PUBLIC_DIR=/static/@./static and STATIC_URL=/static); otherwise it is uploaded to the
+Wave server once per process. Its URL carries the file's digest, so browsers can cache it for good
+and still pick up a new logo.
+
+Each result also has a standalone HTML export (logo inlined, print styles for PDF), written once
+under the cache directory and uploaded once, so it can be shared without opening the live app.
+"""
+import base64
+import hashlib
+import html
+import json
+import os
+from collections import OrderedDict
+
+from h2o_wave import ui
+
+from cache import cache_path, file_digest, write_text
+
+LOGO_FILE = 'static/amex-logo.png'
+STATIC_URL = os.getenv('STATIC_URL')
+
+# Report cards kept in memory, most recently used last
+REPORT_CACHE_SIZE = int(os.getenv('REPORT_CACHE_SIZE', 64))
+
+_logo_url = None
+_cards = OrderedDict()
+_exports = {}
+
+# Report sections: insight field, heading and the prefix of each line on the card
+SECTIONS = [
+    ('key_observations', 'Top churn risk patterns identified:', '   • '),
+    ('executive_action_plan', 'Department-wise Action Plan:', '  '),
+    ('news_article_sources', 'Hot News - Market trends', '  • '),
+]
+
+EXPORT_STYLE = '''
+body { font-family: Helvetica, Arial, sans-serif; color: #1a1a1a; max-width: 860px; margin: 40px auto; padding: 0 24px; line-height: 1.5; }
+h1 { color: #016fd0; }
+h2 { border-top: 1px solid #ddd; padding-top: 16px; }
+li { margin-bottom: 8px; }
+@media print { body { margin: 0; max-width: none; } h2 { break-after: avoid; } li { break-inside: avoid; } }
+'''
+
+
+def key(insight):
+    """Content key of an analysis result."""
+    return hashlib.sha256(json.dumps(insight, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def items(insight, section):
+    """Display lines of one report section, with **bold** markdown."""
+    if section == 'executive_action_plan':
+        return [f'**{item["department"]}**: {item["recommendation"]}' for item in insight[section]]
+    return list(insight[section])
+
+
+async def logo_url(q):
+    global _logo_url
+    if _logo_url is None:
+        if STATIC_URL:
+            _logo_url = f'{STATIC_URL.rstrip("/")}/{os.path.basename(LOGO_FILE)}?v={file_digest(LOGO_FILE)}'
+        else:
+            _logo_url, = await q.site.upload([LOGO_FILE])
+    return _logo_url
+
+
+async def export_url(q, insight):
+    """URL of the standalone HTML export of `insight`, written and uploaded on first use."""
+    report_key = key(insight)
+    url = _exports.get(report_key)
+    if url is None:
+        path = cache_path('reports', f'{report_key}.html')
+        if not os.path.exists(path):
+            write_text(path, export_html(insight))
+        url, = await q.site.upload([path])
+        _exports[report_key] = url
+    return url
+
+
+async def card(q, insight):
+    """The report form card for `insight`, built on first use and then reused for every viewer."""
+    report_key = key(insight)
+    report = _cards.get(report_key)
+    if report is None:
+        logo = await logo_url(q)
+        export = await export_url(q, insight)
+        report = ui.form_card(
+            box='report',
+            items=[
+                ui.image(title='Amex Logo', path=logo, width='300px'),
+                ui.text_xl(content='# Customer Churn Action Plan'),
+                ui.buttons(items=[
+                    ui.button(name='dashboard', label='Back to Dashboard'),
+                ]),
+                ui.link(label='Export as HTML', path=export, download=True),
+                *[
+                    item
+                    for section, title, prefix in SECTIONS
+                    for item in [
+                        ui.separator(),
+                        ui.text_xl(content=f'## {title}'),
+                        *[ui.text_l(content=prefix + line) for line in items(insight, section)],
+                    ]
+                ],
+            ]
+        )
+        _cards[report_key] = report
+        while len(_cards) > REPORT_CACHE_SIZE:
+            _cards.popitem(last=False)
+    else:
+        _cards.move_to_end(report_key)
+    return report
+
+
+def export_html(insight):
+    """Self-contained HTML of the report: no requests to the live app, ready to print to PDF."""
+    with open(LOGO_FILE, 'rb') as f:
+        logo = base64.b64encode(f.read()).decode()
+
+    def markup(line):
+        # Only the **bold** markdown the report uses, around escaped text
+        parts = html.escape(line).split('**')
+        return ''.join(f'<strong>{part}</strong>' if i % 2 else part for i, part in enumerate(parts))
+
+    body = [
+        f'<img src="data:image/png;base64,{logo}" alt="Amex Logo" width="150">',
+        '<h1>Customer Churn Action Plan</h1>',
+        f'<p>{markup(insight["summary"]["executive_summary"])}</p>',
+    ]
+    for section, title, _ in SECTIONS:
+        body.append(f'<h2>{html.escape(title)}</h2>')
+        body.append('<ul>' + ''.join(f'<li>{markup(line)}</li>' for line in items(insight, section)) + '</ul>')
+    return (
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        '<title>Customer Churn Action Plan</title>\n'
+        f'<style>{EXPORT_STYLE}</style>\n</head>\n<body>\n' + '\n'.join(body) + '\n</body>\n</html>\n'
+    )
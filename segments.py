@@ -0,0 +1,220 @@
+import itertools
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Mapping for contact level bins
+CONTACT_LEVEL_LABELS = {
+    0: 'No contact',
+    1: '1 contact',
+    2: '2–3 contacts',
+    3: '4+ contacts'
+}
+
+AGE_BINS = [18, 30, 40, 50, 60, 70, 100]
+AGE_LABELS = ['18–30', '31–40', '41–50', '51–60', '61–70', '70+']
+
+# Categorical columns the dashboard can be filtered on, with their labels
+FILTERS = [
+    ('Card_Category', 'Card Category'),
+    ('Income_Category', 'Income'),
+    ('Gender', 'Gender'),
+    ('Education_Level', 'Education'),
+    ('Marital_Status', 'Marital Status'),
+]
+
+# Rows aggregated per bincount call, bounds the temporary arrays on large files
+BLOCK_ROWS = 1 << 20
+
+
+# Encoders turn a column into (integer codes, keys), with -1 for rows outside every segment
+
+class QuantileBins:
+    """Equal-frequency bins; edges depend on the whole population."""
+
+    def __init__(self, q):
+        self.q = q
+
+    def __call__(self, values):
+        bins = pd.qcut(values, q=self.q, duplicates='drop')
+        return bins.cat.codes.to_numpy(), list(bins.cat.categories)
+
+
+class FixedBins:
+    def __init__(self, bins, labels):
+        self.bins = bins
+        self.labels = list(labels)
+
+    def __call__(self, values):
+        codes = pd.cut(values, bins=self.bins, labels=False)
+        return np.nan_to_num(codes.to_numpy(dtype=float), nan=-1).astype(np.int64), self.labels
+
+
+class Distinct:
+    def __call__(self, values):
+        codes, uniques = pd.factorize(values, sort=True)
+        return codes, list(uniques)
+
+
+class Rounded(Distinct):
+    def __init__(self, decimals):
+        self.decimals = decimals
+
+    def __call__(self, values):
+        return super().__call__(values.round(self.decimals))
+
+
+# Each chart is a segment: which column to encode, how, and how to format a (key, mean) row
+Segment = namedtuple('Segment', 'name column encode row')
+
+SEGMENTS = [
+    Segment('revolving', 'Total_Revolving_Bal', QuantileBins(4),
+            lambda interval, score: [f'{interval.left:.0f}–{interval.right:.0f}', round(score, 3)]),
+    Segment('txn_band', 'txn_band', Distinct(),
+            lambda band, score: [str(band), score]),
+    Segment('util', 'Avg_Utilization_Ratio', Rounded(2),
+            lambda util, score: [float(util), round(score, 3)]),
+    Segment('transaction', 'Total_Trans_Ct', QuantileBins(10),
+            lambda interval, score: [round(float(interval.mid), 2), round(score, 3)]),
+    Segment('contact', 'contact_level', Distinct(),
+            lambda level, score: [CONTACT_LEVEL_LABELS.get(level, str(level)), score]),
+    Segment('age', 'Customer_Age', FixedBins(AGE_BINS, AGE_LABELS),
+            lambda group, score: [str(group), score]),
+]
+
+
+# Dimensions of the heatmap cube, with their labels: the binned and categorical chart segments plus the
+# filter columns. Utilization is left out, at two decimals it has about a hundred levels.
+CUBE_LABELS = {
+    'txn_band': 'Transaction Band',
+    'contact': 'Contact Level',
+    'age': 'Age Group',
+    'revolving': 'Revolving Balance',
+    'transaction': 'Transaction Count',
+    **dict(FILTERS),
+}
+
+CUBE_SEGMENTS = [segment for segment in SEGMENTS if segment.name in CUBE_LABELS] + [
+    Segment(column, column, Distinct(), lambda value, score: [str(value), score]) for column, _ in FILTERS
+]
+
+
+class SegmentEngine:
+    """
+    Encodes every segment dimension once as integer codes, then computes count, sum and mean of p1
+    for all segments of all dimensions with a single bincount over the offset codes.
+    """
+
+    def __init__(self, retained, segments=SEGMENTS, encoded=None):
+        self.segments = segments
+        self.p1 = retained['p1'].to_numpy(dtype=np.float64)
+        # `encoded` is a (codes, keys) pair from an earlier encode() of the same rows, e.g. memory-mapped
+        self.codes, self.keys = encoded if encoded is not None else self.encode(retained)
+
+        # Dimension i owns slots offsets[i] .. offsets[i] + len(keys[i]); the last slot collects misses
+        sizes = [len(keys) for keys in self.keys]
+        self.offsets = [sum(sizes[:i]) for i in range(len(sizes))]
+        self.size = sum(sizes) + 1
+
+    def encode(self, retained):
+        """Offset codes of every dimension (dims x rows) and the keys of each dimension."""
+        codes = np.empty((len(self.segments), len(retained)), dtype=np.int32)
+        all_keys = []
+        offset = 0
+        for i, segment in enumerate(self.segments):
+            segment_codes, keys = segment.encode(retained[segment.column])
+            codes[i] = np.where(segment_codes >= 0, segment_codes + offset, -1)
+            all_keys.append(keys)
+            offset += len(keys)
+        codes[codes < 0] = offset
+        return codes, all_keys
+
+    def aggregate(self, index=None):
+        """Counts and p1 sums per slot, over all rows or only the row positions in `index`."""
+        codes, p1 = self.codes, self.p1
+        if index is not None:
+            codes, p1 = codes[:, index], p1[index]
+        counts = np.zeros(self.size, dtype=np.int64)
+        sums = np.zeros(self.size, dtype=np.float64)
+        n_dims = len(self.segments)
+        for start in range(0, len(p1), BLOCK_ROWS):
+            block = codes[:, start:start + BLOCK_ROWS].ravel()
+            weights = np.tile(p1[start:start + BLOCK_ROWS], n_dims)
+            counts += np.bincount(block, minlength=self.size)
+            sums += np.bincount(block, weights=weights, minlength=self.size)
+        return counts, sums
+
+    def rows(self, index=None):
+        """Chart-ready rows per segment name, skipping empty segments."""
+        counts, sums = self.aggregate(index)
+        charts = {}
+        for segment, keys, offset in zip(self.segments, self.keys, self.offsets):
+            rows = []
+            for i, key in enumerate(keys):
+                count = counts[offset + i]
+                if count:
+                    rows.append(segment.row(key, float(sums[offset + i] / count)))
+            charts[segment.name] = rows
+        return charts
+
+
+class SegmentCube(SegmentEngine):
+    """
+    Count and p1 sum for every pair of dimensions.
+    Pair (i, j) owns len(keys[i]) * len(keys[j]) slots and a row lands in slot code_i * len(keys[j]) + code_j,
+    so the combined codes of all pairs are aggregated together with a single bincount.
+    """
+
+    def __init__(self, retained, segments=CUBE_SEGMENTS, encoded=None):
+        super().__init__(retained, segments, encoded)
+        self.names = [segment.name for segment in segments]
+        self.labels = [[str(segment.row(key, 0.0)[0]) for key in keys] for segment, keys in zip(segments, self.keys)]
+        self.pairs = list(itertools.combinations(range(len(segments)), 2))
+        self.first, self.second = (np.array(side) for side in zip(*self.pairs))
+
+        sizes = np.array([len(keys) for keys in self.keys])
+        self.widths = sizes[self.second]
+        self.pair_offsets = np.concatenate([[0], np.cumsum(sizes[self.first] * self.widths)])
+        self.cube_size = int(self.pair_offsets[-1]) + 1
+
+    def aggregate_pairs(self, index=None):
+        """Counts and p1 sums per pair slot, over all rows or only the row positions in `index`."""
+        codes, p1 = self.codes, self.p1
+        if index is not None:
+            codes, p1 = codes[:, index], p1[index]
+        counts = np.zeros(self.cube_size, dtype=np.int64)
+        sums = np.zeros(self.cube_size, dtype=np.float64)
+        offsets = np.array(self.offsets)[:, None]
+        # Same temporary array size per bincount as SegmentEngine.aggregate
+        block_rows = max(1, BLOCK_ROWS // len(self.pairs))
+        for start in range(0, len(p1), block_rows):
+            block = codes[:, start:start + block_rows]
+            miss = block == self.size - 1
+            local = block - offsets
+            combined = local[self.first] * self.widths[:, None] + local[self.second] + self.pair_offsets[:-1, None]
+            combined[miss[self.first] | miss[self.second]] = self.cube_size - 1
+            weights = np.tile(p1[start:start + block_rows], len(self.pairs))
+            counts += np.bincount(combined.ravel(), minlength=self.cube_size)
+            sums += np.bincount(combined.ravel(), weights=weights, minlength=self.cube_size)
+        return counts, sums
+
+    def heatmap(self, totals, x, y):
+        """[x label, y label, mean p1, count] per non-empty cell of dimensions `x` by `y`, from `aggregate_pairs` totals."""
+        i, j = self.names.index(x), self.names.index(y)
+        transposed = i > j
+        if transposed:
+            i, j = j, i
+        start = self.pair_offsets[self.pairs.index((i, j))]
+        width = len(self.keys[j])
+        counts, sums = totals
+        counts = counts[start:start + len(self.keys[i]) * width].reshape(-1, width)
+        sums = sums[start:start + counts.size].reshape(-1, width)
+
+        rows = []
+        for a, b in zip(*np.nonzero(counts)):
+            row = [self.labels[i][a], self.labels[j][b]]
+            if transposed:
+                row.reverse()
+            rows.append(row + [round(float(sums[a, b] / counts[a, b]), 3), int(counts[a, b])])
+        return rows
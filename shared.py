@@ -0,0 +1,90 @@
+"""
+Read-only access to the dataset versions published by `python -m publisher`.
+
+With DASHBOARD_SHARED_DIR set, app workers neither parse nor hash the scored file. They follow the
+version named in DASHBOARD_SHARED_DIR/CURRENT and memory-map its files, so every worker reads the
+same pages of the OS page cache instead of holding its own copy:
+
+- retained.feather  retained customers with scaled scores, uncompressed Feather
+- snapshot.json     the aggregates snapshot, as aggregates.get_snapshot returns it
+- *.npy             per-row arrays of the segment engine, the heatmap cube and the at-risk index
+- keys.pkl          the segment keys those arrays are coded against
+
+A version directory is complete before it is renamed into place, and CURRENT is only replaced
+afterwards, atomically. A request works on the version its snapshot names, so it never mixes two
+versions even when CURRENT moves while it runs.
+"""
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+from cache import read_json
+from loader import read_columnar
+
+SHARED_DIR = os.getenv('DASHBOARD_SHARED_DIR')
+
+POINTER = 'CURRENT'
+
+# Per-row arrays of a version: name -> file names, loaded as one tuple per name
+ARRAYS = {
+    'segments': ('segments.npy',),
+    'cube': ('cube.npy',),
+    'at_risk': ('by_score.npy', 'sorted_scores.npy'),
+}
+
+_pointer = (None, None)  # (CURRENT's mtime, version it names)
+_snapshot = None
+
+
+def version_dir(version, shared_dir=None):
+    return os.path.join(shared_dir or SHARED_DIR, version)
+
+
+def current_version():
+    """Version named by CURRENT; the file is only re-read when it has been replaced."""
+    global _pointer
+    path = os.path.join(SHARED_DIR, POINTER)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        raise RuntimeError(f'No dataset published in {SHARED_DIR}; run `python -m publisher` first') from None
+    if _pointer[0] != mtime:
+        with open(path) as f:
+            _pointer = (mtime, f.read().strip())
+    return _pointer[1]
+
+
+def point_to(version, shared_dir=None):
+    """Make `version` current for every worker at once."""
+    shared_dir = shared_dir or SHARED_DIR
+    fd, tmp = tempfile.mkstemp(dir=shared_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(version)
+    os.chmod(tmp, 0o644)  # mkstemp's 0600 would hide it from workers running as other users
+    os.replace(tmp, os.path.join(shared_dir, POINTER))
+
+
+def snapshot():
+    global _snapshot
+    version = current_version()
+    if _snapshot is None or _snapshot['version'] != version:
+        _snapshot = read_json(os.path.join(version_dir(version), 'snapshot.json'))
+    return _snapshot
+
+
+def retained(version):
+    return read_columnar(os.path.join(version_dir(version), 'retained.feather'))
+
+
+def arrays(version):
+    """{name: (codes, keys) or arrays} for FilterIndex, memory-mapped read-only."""
+    directory = version_dir(version)
+    with open(os.path.join(directory, 'keys.pkl'), 'rb') as f:
+        keys = pickle.load(f)
+    loaded = {}
+    for name, files in ARRAYS.items():
+        mapped = tuple(np.load(os.path.join(directory, file), mmap_mode='r') for file in files)
+        loaded[name] = (mapped[0], keys[name]) if name in keys else mapped
+    return loaded
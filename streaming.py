@@ -0,0 +1,203 @@
+"""
+Out-of-core aggregation for scored files too large to load as one DataFrame.
+
+The file is read twice in chunks of DASHBOARD_CHUNK_ROWS rows, so peak memory depends on the chunk
+size and the number of segments, never on the file size:
+
+1. A bounds pass finds the min and max of p1 over all rows (needed to scale scores exactly as the
+   in-memory path does) and the range of every quantile-binned column over retained rows.
+2. An aggregation pass folds each chunk into PartialAggregates, which merge by addition.
+
+Tolerance against the in-memory path (loader.load_dataset + aggregates.compute_snapshot):
+
+- KPI counts, averages and every Distinct/Rounded/FixedBins segment are exact, up to float
+  summation order.
+- `threshold` is exact: scaled scores are integers 0-100, so the score histogram holds every value.
+- pd.qcut bin edges are exact for integer columns spanning fewer than MAX_BINS values (this covers
+  Total_Revolving_Bal and Total_Trans_Ct). Otherwise each edge is within one histogram bin width,
+  (max - min) / MAX_BINS, of pd.qcut's, and only rows in that boundary bin can be counted in the
+  neighbouring interval.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from loader import read_csv, scale_scores
+from segments import SEGMENTS, FixedBins, QuantileBins
+
+CHUNK_ROWS = int(os.getenv('DASHBOARD_CHUNK_ROWS', 500_000))
+
+# Resolution of the quantile sketch per binned column
+MAX_BINS = 1 << 16
+
+
+class ValueHistogram:
+    """Mergeable quantile sketch: fixed-width bins over a known range, with count and p1 sum per bin."""
+
+    def __init__(self, lo, hi, integer):
+        self.lo = lo
+        if integer and hi - lo + 1 <= MAX_BINS:
+            self.width = 1
+            n_bins = int(hi - lo) + 1
+            self.values = lo + np.arange(n_bins, dtype=np.float64)
+        else:
+            n_bins = MAX_BINS if hi > lo else 1
+            self.width = (hi - lo) / n_bins or 1
+            self.values = lo + (np.arange(n_bins) + 0.5) * self.width
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.sums = np.zeros(n_bins, dtype=np.float64)
+
+    def add(self, values, p1):
+        index = np.clip(((values - self.lo) // self.width).astype(np.int64), 0, len(self.counts) - 1)
+        self.counts += np.bincount(index, minlength=len(self.counts))
+        self.sums += np.bincount(index, weights=p1, minlength=len(self.counts))
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.sums += other.sums
+
+    def quantile(self, q):
+        """Linear interpolation between order statistics, like pandas' default."""
+        n = self.counts.sum()
+        position = (n - 1) * q
+        k = int(np.floor(position))
+        cumulative = np.cumsum(self.counts)
+        below, above = self.values[np.searchsorted(cumulative, [k, min(k + 1, n - 1)], side='right')]
+        return below + (position - k) * (above - below)
+
+    def bins(self, q):
+        """Counts and p1 sums per equal-frequency interval, labelled like pd.qcut."""
+        edges = [self.quantile(x) for x in np.linspace(0, 1, q + 1)]
+        occupied = self.counts > 0
+        intervals = pd.cut(pd.Series(self.values[occupied]), bins=edges, include_lowest=True, duplicates='drop')
+        codes = intervals.cat.codes.to_numpy()
+        n = len(intervals.cat.categories)
+        counts = np.bincount(codes, weights=self.counts[occupied], minlength=n)
+        sums = np.bincount(codes, weights=self.sums[occupied], minlength=n)
+        return list(intervals.cat.categories), counts, sums
+
+
+class PartialAggregates:
+    """Running totals for a set of chunks; two partials over disjoint rows merge into their union."""
+
+    def __init__(self, ranges, segments=SEGMENTS):
+        self.segments = segments
+        self.retained = 0
+        self.p1_sum = 0.0
+        self.p1_min = np.inf
+        self.p1_max = -np.inf
+        self.scores = ValueHistogram(0, 100, integer=True)
+        self.groups = {}
+        for segment in segments:
+            if isinstance(segment.encode, QuantileBins):
+                self.groups[segment.name] = ValueHistogram(*ranges[segment.name])
+            else:
+                self.groups[segment.name] = {}
+
+    def add(self, retained):
+        """Fold in one chunk of retained rows with scaled scores."""
+        p1 = retained['p1'].to_numpy(dtype=np.float64)
+        if not len(p1):
+            return
+        self.retained += len(p1)
+        # Plain floats: the totals end up in snapshots and on Wave cards, which can't take NumPy scalars
+        self.p1_sum += float(p1.sum())
+        self.p1_min = min(self.p1_min, float(p1.min()))
+        self.p1_max = max(self.p1_max, float(p1.max()))
+        self.scores.add(p1, p1)
+
+        for segment in self.segments:
+            group = self.groups[segment.name]
+            if isinstance(group, ValueHistogram):
+                group.add(retained[segment.column].to_numpy(dtype=np.float64), p1)
+                continue
+            codes, keys = segment.encode(retained[segment.column])
+            valid = codes >= 0
+            counts = np.bincount(codes[valid], minlength=len(keys))
+            sums = np.bincount(codes[valid], weights=p1[valid], minlength=len(keys))
+            for key, count, total in zip(keys, counts, sums):
+                if count:
+                    running = group.setdefault(key, [0, 0.0])
+                    running[0] += int(count)
+                    running[1] += float(total)
+
+    def merge(self, other):
+        self.retained += other.retained
+        self.p1_sum += other.p1_sum
+        self.p1_min = min(self.p1_min, other.p1_min)
+        self.p1_max = max(self.p1_max, other.p1_max)
+        self.scores.merge(other.scores)
+        for name, group in self.groups.items():
+            if isinstance(group, ValueHistogram):
+                group.merge(other.groups[name])
+                continue
+            for key, (count, total) in other.groups[name].items():
+                running = group.setdefault(key, [0, 0.0])
+                running[0] += count
+                running[1] += total
+
+    def kpis(self, risk_quantile):
+        if not self.retained:
+            return dict(threshold=0.0, total_retained=0, total_at_risk=0, percent_at_risk=0, avg_score_retained=0.0)
+        threshold = float(self.scores.quantile(risk_quantile))
+        total_at_risk = int(self.scores.counts[self.scores.values >= threshold].sum())
+        return dict(
+            threshold=threshold,
+            total_retained=self.retained,
+            total_at_risk=total_at_risk,
+            percent_at_risk=total_at_risk / self.retained,
+            avg_score_retained=float(self.p1_sum / self.retained),
+        )
+
+    def charts(self):
+        charts = {}
+        for segment in self.segments:
+            group = self.groups[segment.name]
+            if isinstance(group, ValueHistogram):
+                keys, counts, sums = group.bins(segment.encode.q)
+                totals = zip(keys, counts, sums)
+            else:
+                if isinstance(segment.encode, FixedBins):
+                    keys = [label for label in segment.encode.labels if label in group]
+                else:
+                    keys = sorted(group)
+                totals = ((key, *group[key]) for key in keys)
+            charts[segment.name] = [segment.row(key, float(total / count)) for key, count, total in totals if count]
+        return charts
+
+
+def scan_bounds(path, segments=SEGMENTS, chunk_rows=CHUNK_ROWS):
+    """p1 bounds over all rows, and (min, max, integer) over retained rows for each quantile-binned column."""
+    binned = {segment.name: segment.column for segment in segments if isinstance(segment.encode, QuantileBins)}
+    p1_min, p1_max = np.inf, -np.inf
+    lows, highs, integer = {}, {}, {}
+    for chunk in read_csv(path, chunksize=chunk_rows):
+        p1_min = min(p1_min, chunk['p1'].min())
+        p1_max = max(p1_max, chunk['p1'].max())
+        retained = chunk[chunk['predict'] == 0]
+        for name, column in binned.items():
+            if len(retained):
+                lows[name] = min(lows.get(name, np.inf), retained[column].min())
+                highs[name] = max(highs.get(name, -np.inf), retained[column].max())
+            integer[name] = retained[column].dtype.kind in 'iu'
+    ranges = {name: (lows.get(name, 0), highs.get(name, 0), integer.get(name, True)) for name in binned}
+    return p1_min, p1_max, ranges
+
+
+def aggregate_partials(path, chunk_rows=CHUNK_ROWS):
+    """Merged PartialAggregates for `path`, with the p1 bounds and column ranges they were built with."""
+    p1_min, p1_max, ranges = scan_bounds(path, chunk_rows=chunk_rows)
+    totals = PartialAggregates(ranges)
+    for chunk in read_csv(path, chunksize=chunk_rows):
+        scale_scores(chunk, p1_min, p1_max)
+        partial = PartialAggregates(ranges)
+        partial.add(chunk[chunk['predict'] == 0])
+        totals.merge(partial)
+    return p1_min, p1_max, ranges, totals
+
+
+def aggregate_file(path, risk_quantile, chunk_rows=CHUNK_ROWS):
+    """KPI values and chart rows for `path`, matching aggregates.compute_snapshot within the tolerance above."""
+    totals = aggregate_partials(path, chunk_rows)[-1]
+    return totals.kpis(risk_quantile), totals.charts()
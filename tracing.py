@@ -0,0 +1,134 @@
+"""
+Named timing spans for the dashboard's hot paths.
+
+Enable with DASHBOARD_TRACING=1. Each span name keeps a cumulative histogram (exported as Prometheus
+text) and its last TRACING_WINDOW durations (for rolling percentiles, exported as JSON). With
+TRACING_EXPORT=path.prom or path.json the metrics are written there every TRACING_EXPORT_INTERVAL
+seconds, e.g. for a node_exporter textfile collector. Users listed in TRACING_ADMINS (comma
+separated, or '*' for everyone) see a performance card on the dashboard.
+
+Disabled, `span` returns one shared no-op context manager, so a traced block costs a function call.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import nullcontext
+
+from cache import write_json, write_text
+
+TRACING = os.getenv('DASHBOARD_TRACING', '0') == '1'
+TRACING_WINDOW = int(os.getenv('TRACING_WINDOW', 1024))
+TRACING_ADMINS = {name.strip() for name in os.getenv('TRACING_ADMINS', '').split(',') if name.strip()}
+TRACING_EXPORT = os.getenv('TRACING_EXPORT')
+TRACING_EXPORT_INTERVAL = float(os.getenv('TRACING_EXPORT_INTERVAL', 15))
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_NOOP = nullcontext()
+_lock = threading.Lock()
+_histograms = {}
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=TRACING_WINDOW)
+
+    def add(self, seconds):
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def summary(self):
+        """Totals since startup, and percentiles over the rolling window, in seconds."""
+        recent = sorted(self.recent)
+
+        def percentile(q):
+            return recent[min(len(recent) - 1, int(q * len(recent)))] if recent else 0.0
+
+        return dict(count=self.count, sum=self.sum, p50=percentile(0.5), p95=percentile(0.95),
+                    p99=percentile(0.99), max=recent[-1] if recent else 0.0)
+
+
+class Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Context manager timing the block it wraps under `name`; safe on worker threads."""
+    return Span(name) if TRACING else _NOOP
+
+
+def record(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds)
+
+
+def summary():
+    """{span name: summary} for every span recorded so far, by name."""
+    with _lock:
+        return {name: _histograms[name].summary() for name in sorted(_histograms)}
+
+
+def to_json():
+    return json.dumps(summary())
+
+
+def to_prometheus():
+    lines = [
+        '# HELP dashboard_span_seconds Time spent in each traced stage of the dashboard.',
+        '# TYPE dashboard_span_seconds histogram',
+    ]
+    with _lock:
+        for name in sorted(_histograms):
+            histogram = _histograms[name]
+            cumulative = 0
+            for bound, count in zip((*BUCKETS, '+Inf'), histogram.buckets):
+                cumulative += count
+                lines.append(f'dashboard_span_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'dashboard_span_seconds_sum{{span="{name}"}} {histogram.sum}')
+            lines.append(f'dashboard_span_seconds_count{{span="{name}"}} {histogram.count}')
+    return '\n'.join(lines) + '\n'
+
+
+def export(path):
+    """Write the metrics to `path` atomically, as JSON for *.json and Prometheus text otherwise."""
+    if path.endswith('.json'):
+        write_json(path, summary())
+    else:
+        write_text(path, to_prometheus())
+
+
+async def export_periodically(path=TRACING_EXPORT, interval=TRACING_EXPORT_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            export(path)
+        except OSError as e:
+            print(f'Tracing export failed: {e}')
+
+
+def is_admin(username):
+    return TRACING and ('*' in TRACING_ADMINS or username in TRACING_ADMINS)